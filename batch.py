@@ -0,0 +1,275 @@
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import DetectionCache
+from engine import (DetectionEngine, weights_for_tier, BACKENDS, DEFAULT_BACKEND, DEFAULT_WEIGHTS,
+                    DEFAULT_IMGSZ, DEFAULT_CONF, DEFAULT_PRECISION, MODEL_TIERS, PRECISIONS)
+from imaging import DecodedImage, is_image_file
+from profiling import profiler
+from store import DetectionStore
+from tiling import detect_tiled, DEFAULT_OVERLAP, MERGE_NMS, MERGE_WBF
+
+
+def collect_image_paths(inputs, recursive=False):
+    """تبدیل لیست ورودی‌ها (پوشه، الگوی glob، فایل تصویر یا فایل متنی لیست) به لیست مسیر تصاویر"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, "**", "*") if recursive else os.path.join(item, "*")
+            paths.extend(sorted(p for p in glob.glob(pattern, recursive=recursive) if is_image_file(p)))
+        elif item.lower().endswith(".txt") and os.path.isfile(item):
+            # فایل متنی که در هر خط یک مسیر تصویر دارد
+            with open(item, encoding="utf-8") as f:
+                paths.extend(line.strip() for line in f if line.strip())
+        elif glob.has_magic(item):
+            paths.extend(sorted(p for p in glob.glob(item, recursive=recursive) if is_image_file(p)))
+        else:
+            paths.append(item)
+    return paths
+
+
+def decode_image(path):
+    with profiler.stage("decode"):
+        image = DecodedImage.open(path)
+        image.pixels
+    return image
+
+
+def iter_decoded(paths, workers=4, prefetch=16):
+    """decode کردن تصاویر در یک thread pool با پیش‌خوانی محدود؛ ترتیب ورودی حفظ می‌شود
+
+    برای هر مسیر (path, DecodedImage, error) برمی‌گرداند.
+    """
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decode") as pool:
+        pending = deque()
+        paths = iter(paths)
+
+        # حداکثر prefetch تصویر همزمان در حافظه نگه داشته می‌شود
+        for path in paths:
+            pending.append((path, pool.submit(decode_image, path)))
+            if len(pending) >= prefetch:
+                break
+
+        while pending:
+            path, future = pending.popleft()
+            try:
+                yield path, future.result(), None
+            except Exception as e:
+                yield path, None, e
+
+            next_path = next(paths, None)
+            if next_path is not None:
+                pending.append((next_path, pool.submit(decode_image, next_path)))
+
+
+def iter_batches(items, batch_size):
+    """گروه‌بندی یک iterator به دسته‌هایی با اندازه batch_size"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def make_record(path, detections, elapsed):
+    """ساخت رکورد خروجی یک تصویر از Detections"""
+    ranking = detections.ranking()
+    return {
+        "image": path,
+        "total_objects": len(detections),
+        "class_counts": {name: count for name, _, count in ranking},
+        "max_confidence": {name: confidence for name, confidence, _ in ranking},
+        "boxes": detections.to_records(),
+        "time": elapsed,
+    }
+
+
+def run_batch(engine, paths, batch_size=8, workers=4, store=None):
+    """اجرای پیش‌بینی روی مسیرها به صورت جریانی؛ برای هر تصویر یک رکورد برمی‌گرداند
+
+    حافظه مصرفی به اندازه batch و پیش‌خوانی محدود است، نه تعداد کل تصاویر.
+    اگر store داده شود نتایج هر تصویر به آن هم اضافه می‌شود.
+    """
+    decoded = iter_decoded(paths, workers=workers, prefetch=max(batch_size * 2, workers))
+    batches = deque()
+
+    def valid_images():
+        for batch in iter_batches(decoded, batch_size):
+            batches.append(batch)
+            yield [image for _, image, error in batch if error is None]
+
+    # با چند فرایند، detect_batches چند batch را همزمان در جریان نگه می‌دارد؛ زمان هر تصویر
+    # از فاصله بین نتایج محاسبه می‌شود
+    last_time = time.perf_counter()
+    for results, batch_error in engine.detect_batches(valid_images()):
+        batch = batches.popleft()
+        valid = [path for path, _, error in batch if error is None]
+        now = time.perf_counter()
+        elapsed, last_time = (now - last_time) / max(len(valid), 1), now
+
+        # تصاویری که decode نشدند با پیام خطا گزارش می‌شوند
+        for path, image, error in batch:
+            if error is not None:
+                yield {"image": path, "error": str(error)}
+
+        if batch_error is not None:
+            for path in valid:
+                yield {"image": path, "error": str(batch_error)}
+            continue
+
+        for path, detections in zip(valid, results):
+            if store is not None:
+                store.add(os.path.abspath(path), detections)
+                store.maybe_save()
+            yield make_record(path, detections, elapsed)
+
+
+def run_tiled(engine, paths, tile, overlap=DEFAULT_OVERLAP, batch_size=8, method=MERGE_NMS, store=None):
+    """اجرای پیش‌بینی کاشی‌بندی‌شده روی هر تصویر؛ تصاویر بدون decode کامل از قبل خوانده می‌شوند"""
+    for path in paths:
+        start_time = time.perf_counter()
+        try:
+            detections = detect_tiled(engine, path, tile=tile, overlap=overlap, batch_size=batch_size,
+                                      method=method)
+        except Exception as e:
+            yield {"image": path, "error": str(e)}
+            continue
+        if store is not None:
+            store.add(os.path.abspath(path), detections)
+            store.maybe_save()
+        yield make_record(path, detections, time.perf_counter() - start_time)
+
+
+class JsonlWriter:
+    """نوشتن رکوردها به صورت یک خط JSON برای هر تصویر"""
+
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+
+
+class CsvWriter:
+    """نوشتن رکوردها در CSV؛ یک سطر برای هر کلاس در هر تصویر (تعداد و بالاترین confidence)"""
+
+    FIELDS = ["image", "class_name", "count", "max_confidence", "total_objects", "error"]
+
+    def __init__(self, file, header=True):
+        self.file = file
+        self.writer = csv.DictWriter(file, fieldnames=self.FIELDS)
+        if header:
+            self.writer.writeheader()
+
+    def write(self, record):
+        class_counts = record.get("class_counts") or {}
+        if not class_counts:
+            self.writer.writerow({"image": record["image"], "count": 0,
+                                  "total_objects": record.get("total_objects", 0),
+                                  "error": record.get("error", "")})
+        for class_name, count in class_counts.items():
+            self.writer.writerow({"image": record["image"], "class_name": class_name, "count": count,
+                                  "max_confidence": f"{record['max_confidence'][class_name]:.4f}",
+                                  "total_objects": record["total_objects"], "error": ""})
+        self.file.flush()
+
+
+def open_writer(file, output_format, header=True):
+    """header=False برای افزودن به فایل CSV موجود بدون تکرار سطر عنوان"""
+    if output_format == "csv":
+        return CsvWriter(file, header=header)
+    return JsonlWriter(file)
+
+
+def add_arguments(parser):
+    """آرگومان‌های خط فرمان حالت batch"""
+    parser.add_argument("inputs", nargs="+", help="image files, folders, glob patterns or .txt path lists")
+    parser.add_argument("-o", "--output", help="output file (.jsonl or .csv); stdout if omitted")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="output format (default: from extension)")
+    parser.add_argument("--recursive", action="store_true", help="search folders recursively")
+    parser.add_argument("--batch-size", type=int, default=8, help="images per predict call")
+    parser.add_argument("--workers", type=int, default=4, help="decode threads")
+    add_model_arguments(parser)
+    parser.add_argument("--tile", type=int, metavar="SIZE", help="tiled inference with this tile size")
+    parser.add_argument("--tile-overlap", type=float, default=DEFAULT_OVERLAP)
+    parser.add_argument("--tile-merge", choices=[MERGE_NMS, MERGE_WBF], default=MERGE_NMS)
+    parser.add_argument("--cache", metavar="PATH", help="SQLite detection cache to reuse between runs")
+    parser.add_argument("--store", metavar="PATH",
+                        help="append detections to this columnar store (.npz); off unless given")
+
+
+def add_model_arguments(parser):
+    """آرگومان‌های مشترک انتخاب مدل، backend، دقت محاسبات و thread"""
+    parser.add_argument("--weights", default=DEFAULT_WEIGHTS)
+    parser.add_argument("--model", choices=MODEL_TIERS, help="model tier (overrides --weights)")
+    parser.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ)
+    parser.add_argument("--conf", type=float, default=DEFAULT_CONF)
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND)
+    parser.add_argument("--precision", choices=PRECISIONS, default=DEFAULT_PRECISION,
+                        help="bf16 needs the torch backend; int8 runs a quantised ONNX model")
+    parser.add_argument("--threads", type=int, help="intra-op threads (per process)")
+    parser.add_argument("--interop-threads", type=int, help="inter-op threads")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="inference processes, each with its own model (0 = one per core group)")
+
+
+def engine_from_args(args, cache=None):
+    """ساخت DetectionEngine از آرگومان‌های خط فرمان"""
+    weights = weights_for_tier(args.model) if args.model else args.weights
+    return DetectionEngine(weights, imgsz=args.imgsz, conf=args.conf, cache=cache, backend=args.backend,
+                           threads=args.threads, interop_threads=args.interop_threads,
+                           processes=args.processes, precision=args.precision)
+
+
+def run(args):
+    """اجرای حالت batch از خط فرمان"""
+    paths = collect_image_paths(args.inputs, recursive=args.recursive)
+    if not paths:
+        print("No images found", file=sys.stderr)
+        return 1
+
+    cache = DetectionCache(path=args.cache) if args.cache else None
+    store = DetectionStore.open(args.store) if args.store else None
+    engine = engine_from_args(args, cache=cache)
+    engine.load()
+
+    output_format = args.format or ("csv" if args.output and args.output.lower().endswith(".csv") else "jsonl")
+    file = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+
+    processed = 0
+    start_time = time.perf_counter()
+    try:
+        writer = open_writer(file, output_format)
+        if args.tile:
+            records = run_tiled(engine, paths, args.tile, overlap=args.tile_overlap, batch_size=args.batch_size,
+                                method=args.tile_merge, store=store)
+        else:
+            records = run_batch(engine, paths, batch_size=args.batch_size, workers=args.workers, store=store)
+        for record in records:
+            writer.write(record)
+            processed += 1
+    finally:
+        engine.close()
+        if file is not sys.stdout:
+            file.close()
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Processed {processed} images in {elapsed:.2f}s ({processed / max(elapsed, 1e-9):.1f} img/s)",
+          file=sys.stderr)
+    if cache is not None:
+        print(cache.stats_text(), file=sys.stderr)
+        cache.close()
+    if store is not None:
+        store.save()
+        print(store.stats_text(), file=sys.stderr)
+    return 0
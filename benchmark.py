@@ -0,0 +1,325 @@
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from detections import Detections
+from engine import DetectionEngine, weights_for_tier, BACKENDS, DEFAULT_IMGSZ, MODEL_TIERS
+from imaging import AnnotationRenderer, DecodedImage, PREVIEW_SIZE
+
+# مراحل اندازه‌گیری‌شده در هر تکرار
+STAGES = ("decode", "preprocess", "inference", "postprocess", "annotate", "display")
+
+# تصویر نمونه همراه پروژه و اندازه‌های پیش‌فرض تصاویر مصنوعی
+SAMPLE_IMAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catttt.jpg")
+DEFAULT_SYNTHETIC_SIZES = ("640x480", "1920x1080", "4000x3000")
+
+
+def percentiles(samples):
+    """خلاصه آماری نمونه‌ها (میلی‌ثانیه)"""
+    if not samples:
+        return None
+    values = np.asarray(samples, dtype=np.float64)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"n": int(values.size), "mean": float(values.mean()), "min": float(values.min()),
+            "p50": float(p50), "p95": float(p95), "p99": float(p99), "max": float(values.max())}
+
+
+def peak_rss_mb():
+    """بیشترین حافظه مصرفی فرایند (MB)؛ روی سیستم‌هایی که پشتیبانی نمی‌کنند None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # لینوکس کیلوبایت و macOS بایت برمی‌گرداند
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def make_synthetic_images(directory, sizes, seed=0):
+    """ساخت تصاویر JPEG مصنوعی با نویز و گرادیان تا decode واقعی اندازه‌گیری شود"""
+    rng = np.random.default_rng(seed)
+    paths = []
+    for size in sizes:
+        width, height = (int(v) for v in size.lower().split("x"))
+        gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+        noise = rng.normal(0, 40, (height, width, 3)).astype(np.float32)
+        pixels = np.clip(gradient + noise, 0, 255).astype(np.uint8)
+        path = os.path.join(directory, f"synthetic_{width}x{height}.jpg")
+        Image.fromarray(pixels).save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+class DisplayProbe:
+    """اندازه‌گیری هزینه ساخت PhotoImage در صورت در دسترس بودن نمایشگر"""
+
+    def __init__(self):
+        self.root = None
+        try:
+            import tkinter as tk
+
+            self.root = tk.Tk()
+            self.root.withdraw()
+        except Exception:
+            self.root = None
+
+    def measure(self, image):
+        if self.root is None:
+            return None
+        from PIL import ImageTk
+
+        start_time = time.perf_counter()
+        ImageTk.PhotoImage(image)
+        self.root.update_idletasks()
+        return (time.perf_counter() - start_time) * 1000
+
+    def close(self):
+        if self.root is not None:
+            self.root.destroy()
+
+
+def make_engine(config):
+    return DetectionEngine(weights_for_tier(config["tier"]), imgsz=config["imgsz"],
+                           backend=config["backend"], threads=config["threads"] or None)
+
+
+def measure_iteration(engine, renderer, display, batch):
+    """اجرای یک تکرار کامل روی یک batch؛ خروجی (زمان هر مرحله به میلی‌ثانیه، زمان کل به ثانیه)"""
+    sample = {stage: 0.0 for stage in STAGES}
+    iteration_start = time.perf_counter()
+
+    # decode (خواندن فایل و ساخت آرایه ورودی مدل)
+    t = time.perf_counter()
+    images = [DecodedImage.open(path) for path in batch]
+    for image in images:
+        image.pixels
+    sample["decode"] = (time.perf_counter() - t) * 1000
+
+    # preprocess / inference / NMS به تفکیک خود ultralytics (میلی‌ثانیه برای هر تصویر)
+    results = engine.predict(images)
+    for result in results:
+        speed = getattr(result, "speed", None) or {}
+        sample["preprocess"] += speed.get("preprocess", 0.0)
+        sample["inference"] += speed.get("inference", 0.0)
+        sample["postprocess"] += speed.get("postprocess", 0.0)
+
+    # تبدیل به Detections بخشی از postprocess حساب می‌شود
+    t = time.perf_counter()
+    detections = [Detections.from_result(result, engine.names) for result in results]
+    sample["postprocess"] += (time.perf_counter() - t) * 1000
+
+    t = time.perf_counter()
+    annotated = [renderer.render(image, item, PREVIEW_SIZE) for image, item in zip(images, detections)]
+    sample["annotate"] = (time.perf_counter() - t) * 1000
+
+    display_times = [display.measure(image) for image in annotated]
+    sample["display"] = sum(display_times) if None not in display_times else None
+    return sample, time.perf_counter() - iteration_start
+
+
+def run_cold(config, paths):
+    """فقط بارگذاری مدل و اولین تکرار؛ برای تکرار اندازه‌گیری cold در فرایندهای تازه"""
+    engine = make_engine(config)
+    display = DisplayProbe()
+    try:
+        start_time = time.perf_counter()
+        engine.load(warmup=False)
+        load_time = time.perf_counter() - start_time
+        batch = list(itertools.islice(itertools.cycle(paths), config["batch_size"]))
+        sample, elapsed = measure_iteration(engine, AnnotationRenderer(), display, batch)
+    finally:
+        display.close()
+    return load_time, dict(sample, end_to_end=elapsed * 1000)
+
+
+def cold_stats(samples):
+    """خلاصه آماری تکرارهای cold برای هر مرحله"""
+    return {stage: percentiles([sample[stage] for sample in samples if sample.get(stage) is not None])
+            for stage in STAGES + ("end_to_end",)}
+
+
+def run_config(config, paths, iterations, warmup):
+    """اجرای یک ترکیب (مدل، backend، batch، thread) و برگرداندن نتایج به صورت dict"""
+    engine = make_engine(config)
+    renderer = AnnotationRenderer()
+    display = DisplayProbe()
+
+    start_time = time.perf_counter()
+    engine.load(warmup=False)
+    load_time = time.perf_counter() - start_time
+
+    batch_size = config["batch_size"]
+    path_cycle = itertools.cycle(paths)
+
+    cold = None
+    warm = {stage: [] for stage in STAGES}
+    end_to_end = []
+    warm_images = 0
+    warm_time = 0.0
+
+    try:
+        for iteration in range(1 + warmup + iterations):
+            batch = [next(path_cycle) for _ in range(batch_size)]
+            sample, elapsed = measure_iteration(engine, renderer, display, batch)
+
+            if iteration == 0:
+                cold = dict(sample, end_to_end=elapsed * 1000)
+            elif iteration > warmup:
+                for stage in STAGES:
+                    if sample[stage] is not None:
+                        warm[stage].append(sample[stage])
+                end_to_end.append(elapsed * 1000)
+                warm_images += len(batch)
+                warm_time += elapsed
+    finally:
+        display.close()
+
+    # cold_ms با چند اجرای تازه در run() به آمار تبدیل می‌شود
+    return dict(config,
+                load_s=load_time,
+                cold_ms=cold,
+                warm_ms={stage: percentiles(samples) for stage, samples in warm.items()},
+                end_to_end_ms=percentiles(end_to_end),
+                images_per_sec=warm_images / warm_time if warm_time > 0 else None,
+                peak_rss_mb=peak_rss_mb())
+
+
+def run_scaling(config, paths, processes, images_per_run, batch_size):
+    """توان عملیاتی (تصویر بر ثانیه) به ازای تعداد فرایندهای مختلف روی تصاویر از پیش decode شده"""
+    images = [DecodedImage.open(path) for path in paths]
+    for image in images:
+        image.pixels
+    batches = [list(itertools.islice(itertools.cycle(images), batch_size))
+               for _ in range(max(images_per_run // batch_size, 1))]
+
+    results = []
+    for count in processes:
+        print(f"Scaling run with {count} processes", file=sys.stderr)
+        engine = DetectionEngine(weights_for_tier(config["tier"]), imgsz=config["imgsz"],
+                                 backend=config["backend"], threads=config["threads"] or None, processes=count)
+        try:
+            start_time = time.perf_counter()
+            engine.load()
+            load_time = time.perf_counter() - start_time
+
+            # یک دور گرم کردن تا حافظه‌های مشترک و کش‌های داخلی ساخته شوند
+            for _ in engine.detect_batches(batches[:2]):
+                pass
+
+            start_time = time.perf_counter()
+            errors = [error for _, error in engine.detect_batches(batches) if error is not None]
+            elapsed = time.perf_counter() - start_time
+            if errors:
+                raise errors[0]
+
+            total = sum(len(batch) for batch in batches)
+            results.append({"processes": count, "workers": engine.pool.workers if engine.pool else 1,
+                            "threads_per_worker": engine.pool.threads if engine.pool else config["threads"],
+                            "load_s": load_time, "images": total, "images_per_sec": total / elapsed})
+        except Exception as e:
+            results.append({"processes": count, "error": str(e)})
+        finally:
+            engine.close()
+
+    baseline = next((r["images_per_sec"] for r in results if "images_per_sec" in r), None)
+    for result in results:
+        if baseline and "images_per_sec" in result:
+            result["speedup"] = result["images_per_sec"] / baseline
+    return dict(config, batch_size=batch_size, results=results)
+
+
+def environment_info():
+    """مشخصات سیستم برای مقایسه نتایج بین نسخه‌ها"""
+    info = {"python": platform.python_version(), "platform": platform.platform(),
+            "processor": platform.processor(), "cpu_count": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    for module in ("numpy", "PIL", "torch", "ultralytics", "onnxruntime", "openvino"):
+        try:
+            info[module] = __import__(module).__version__
+        except Exception:
+            pass
+    return info
+
+
+def add_arguments(parser):
+    """آرگومان‌های خط فرمان benchmark"""
+    parser.add_argument("--images", nargs="*", help=f"sample images (default: {os.path.basename(SAMPLE_IMAGE)})")
+    parser.add_argument("--synthetic", nargs="*", default=list(DEFAULT_SYNTHETIC_SIZES),
+                        metavar="WxH", help="synthetic image sizes to generate")
+    parser.add_argument("--tiers", nargs="+", choices=MODEL_TIERS, default=["n"])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=["torch"])
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1])
+    parser.add_argument("--threads", nargs="+", type=int, default=[0], help="intra-op threads (0 = auto)")
+    parser.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ)
+    parser.add_argument("--iterations", type=int, default=20, help="measured warm iterations")
+    parser.add_argument("--warmup", type=int, default=3, help="warm-up iterations (not measured)")
+    parser.add_argument("--cold-runs", type=int, default=3,
+                        help="fresh-process runs per configuration for the cold (first iteration) statistics")
+    parser.add_argument("--no-isolate", action="store_true",
+                        help="run all configurations in this process (faster, but not truly cold)")
+    parser.add_argument("--scaling", nargs="+", type=int, metavar="N",
+                        help="also measure images/sec for these process counts (0 = auto)")
+    parser.add_argument("--scaling-images", type=int, default=64, help="images per scaling run")
+    parser.add_argument("-o", "--output", help="JSON output file (default: stdout)")
+
+
+def run(args):
+    """اجرای benchmark روی تمام ترکیب‌ها و نوشتن خروجی JSON"""
+    with tempfile.TemporaryDirectory(prefix="yolo-bench-") as directory:
+        paths = list(args.images) if args.images else [SAMPLE_IMAGE]
+        paths += make_synthetic_images(directory, args.synthetic or [])
+
+        configs = [{"tier": tier, "backend": backend, "batch_size": batch_size, "threads": threads,
+                    "imgsz": args.imgsz}
+                   for tier, backend, batch_size, threads in itertools.product(
+                       args.tiers, args.backends, args.batch_sizes, args.threads)]
+
+        results = []
+        for config in configs:
+            print(f"Benchmarking {config}", file=sys.stderr)
+            try:
+                if args.no_isolate:
+                    result = run_config(config, paths, args.iterations, args.warmup)
+                    load_times, cold_samples = [result["load_s"]], [result["cold_ms"]]
+                else:
+                    # هر اجرا در یک فرایند تازه انجام می‌شود تا زمان cold و حافظه مستقل باشند
+                    context = multiprocessing.get_context("spawn")
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                        result = pool.submit(run_config, config, paths, args.iterations, args.warmup).result()
+                    load_times, cold_samples = [result["load_s"]], [result["cold_ms"]]
+                    for _ in range(args.cold_runs - 1):
+                        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                            load_time, sample = pool.submit(run_cold, config, paths).result()
+                        load_times.append(load_time)
+                        cold_samples.append(sample)
+                result.update(cold_runs=len(cold_samples), load_s=percentiles(load_times),
+                              cold_ms=cold_stats(cold_samples))
+            except Exception as e:
+                result = dict(config, error=str(e))
+            results.append(result)
+
+        scaling = None
+        if args.scaling:
+            # مقیاس‌پذیری با اولین ترکیب مدل/backend/thread سنجیده می‌شود
+            scaling = run_scaling(configs[0], paths, args.scaling, args.scaling_images, args.batch_sizes[0])
+
+    report = {"environment": environment_info(), "images": [os.path.basename(p) for p in paths],
+              "iterations": args.iterations, "warmup": args.warmup, "results": results}
+    if scaling is not None:
+        report["scaling"] = scaling
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
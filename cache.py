@@ -0,0 +1,133 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from detections import Detections
+
+# محل پیش‌فرض cache روی دیسک
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "yolo11_app", "detections.sqlite")
+
+# بودجه پیش‌فرض حافظه cache (بایت)
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# هزینه تقریبی هر ورودی علاوه بر آرایه‌ها (کلید، اشیای پایتون)
+ENTRY_OVERHEAD = 512
+
+_weights_digests = {}
+
+
+def file_digest(path):
+    """hash محتوای فایل (SHA-256)"""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def weights_digest(path):
+    """hash فایل وزن‌ها؛ برای هر (مسیر، زمان تغییر، اندازه) فقط یک بار محاسبه می‌شود"""
+    if not os.path.isfile(path):
+        # وزن‌هایی که ultralytics با نام دانلود می‌کند
+        return hashlib.sha256(path.encode("utf-8")).hexdigest()
+
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    digest = _weights_digests.get(key)
+    if digest is None:
+        digest = file_digest(path)
+        _weights_digests[key] = digest
+    return digest
+
+
+def cache_key(image_digest, model_digest, conf, imgsz):
+    """کلید cache بر اساس محتوای تصویر، وزن‌های مدل، آستانه confidence و اندازه ورودی"""
+    return f"{image_digest}:{model_digest}:{conf:g}:{imgsz}"
+
+
+class DetectionCache:
+    """cache نتایج تشخیص با حذف LRU بر اساس بودجه حافظه و ذخیره اختیاری در SQLite"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, path=None):
+        self.max_bytes = max_bytes
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS detections ("
+                             "key TEXT PRIMARY KEY, xyxy BLOB, conf BLOB, cls BLOB)")
+            self._db.commit()
+
+    def get(self, key, names):
+        """برگرداندن Detections ذخیره‌شده یا None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return Detections(entry.xyxy, entry.conf, entry.cls, names)
+
+            if self._db is not None:
+                row = self._db.execute("SELECT xyxy, conf, cls FROM detections WHERE key = ?",
+                                       (key,)).fetchone()
+                if row is not None:
+                    detections = Detections(np.frombuffer(row[0], dtype=np.float32).reshape(-1, 4),
+                                            np.frombuffer(row[1], dtype=np.float32),
+                                            np.frombuffer(row[2], dtype=np.int32),
+                                            names)
+                    self._remember(key, detections)
+                    self.hits += 1
+                    return detections
+
+            self.misses += 1
+            return None
+
+    def put(self, key, detections):
+        """ذخیره نتیجه در حافظه و در صورت وجود روی دیسک"""
+        with self._lock:
+            self._remember(key, detections)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO detections VALUES (?, ?, ?, ?)",
+                                 (key, detections.xyxy.tobytes(), detections.conf.tobytes(),
+                                  detections.cls.tobytes()))
+                self._db.commit()
+
+    def _remember(self, key, detections):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.nbytes + ENTRY_OVERHEAD
+
+        self._entries[key] = detections
+        self._bytes += detections.nbytes + ENTRY_OVERHEAD
+
+        # حذف قدیمی‌ترین ورودی‌ها تا زمانی که در بودجه حافظه جا شویم
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes + ENTRY_OVERHEAD
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats_text(self):
+        """متن آمار cache برای نمایش در رابط گرافیکی"""
+        return (f"Cache: {self.hits} hits / {self.misses} misses, "
+                f"{len(self._entries)} entries ({self._bytes / (1024 * 1024):.1f} MB)")
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,84 @@
+import numpy as np
+
+
+class Detections:
+    """نتایج تشخیص یک تصویر به صورت آرایه‌های ستونی (struct-of-arrays)
+
+    xyxy: آرایه float32 با شکل (N, 4)
+    conf: آرایه float32 با شکل (N,)
+    cls: آرایه int32 با شکل (N,)
+    names: دیکشنری شناسه کلاس به نام کلاس
+    """
+
+    __slots__ = ("xyxy", "conf", "cls", "names")
+
+    def __init__(self, xyxy, conf, cls, names):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+        self.names = names
+
+    @classmethod
+    def empty(cls, names=None):
+        return cls(np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32),
+                   np.zeros(0, dtype=np.int32), names or {})
+
+    @classmethod
+    def from_result(cls, result, names=None):
+        """تبدیل نتیجه YOLO با یک انتقال یکجا از device به NumPy"""
+        names = names if names is not None else getattr(result, "names", {})
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return cls.empty(names)
+
+        # ستون‌های data: x1, y1, x2, y2, [track_id], conf, cls
+        data = boxes.data.cpu().numpy()
+        return cls(np.ascontiguousarray(data[:, :4], dtype=np.float32),
+                   np.ascontiguousarray(data[:, -2], dtype=np.float32),
+                   data[:, -1].astype(np.int32),
+                   names)
+
+    def __len__(self):
+        return len(self.conf)
+
+    @property
+    def nbytes(self):
+        return self.xyxy.nbytes + self.conf.nbytes + self.cls.nbytes
+
+    def class_stats(self):
+        """تعداد و بالاترین confidence هر کلاس به صورت برداری
+
+        خروجی: (class_ids, counts, max_conf) فقط برای کلاس‌هایی که حداقل یک detection دارند.
+        """
+        if len(self) == 0:
+            return self.cls[:0], np.zeros(0, dtype=np.int64), self.conf[:0]
+
+        minlength = max(len(self.names), int(self.cls.max()) + 1)
+        counts = np.bincount(self.cls, minlength=minlength)
+        max_conf = np.full(minlength, -np.inf, dtype=np.float32)
+        np.maximum.at(max_conf, self.cls, self.conf)
+
+        class_ids = np.flatnonzero(counts)
+        return class_ids, counts[class_ids], max_conf[class_ids]
+
+    def ranking(self):
+        """لیست (نام کلاس، بالاترین confidence، تعداد) مرتب‌شده بر اساس confidence (نزولی)"""
+        class_ids, counts, max_conf = self.class_stats()
+        order = np.argsort(-max_conf, kind="stable")
+        return [(self.names[int(class_ids[i])], float(max_conf[i]), int(counts[i])) for i in order]
+
+    def class_counts(self):
+        """دیکشنری نام کلاس به تعداد"""
+        return {name: count for name, _, count in self.ranking()}
+
+    def class_predictions(self):
+        """دیکشنری نام کلاس به بالاترین confidence"""
+        return {name: confidence for name, confidence, _ in self.ranking()}
+
+    def to_records(self):
+        """لیست کادرها برای خروجی JSON"""
+        xyxy = self.xyxy.tolist()
+        conf = self.conf.tolist()
+        cls = self.cls.tolist()
+        return [{"class_id": c, "class_name": self.names[c], "confidence": s, "xyxy": b}
+                for b, s, c in zip(xyxy, conf, cls)]
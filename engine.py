@@ -0,0 +1,613 @@
+import os
+import queue
+import shutil
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from cache import cache_key, weights_digest
+from detections import Detections
+from pool import InferencePool
+from profiling import profiler
+from tiling import detect_tiled
+
+# مسیر پیش‌فرض وزن‌های مدل، اندازه ورودی و آستانه confidence
+WEIGHTS_DIR = "YOLO11"
+DEFAULT_WEIGHTS = "YOLO11/yolo11x.pt"
+DEFAULT_IMGSZ = 640
+DEFAULT_CONF = 0.2
+
+# نسخه‌های مدل، اندازه‌های ورودی و backend‌های قابل انتخاب
+MODEL_TIERS = ("n", "s", "m", "l", "x")
+IMAGE_SIZES = (320, 416, 480, 640, 800, 960, 1280)
+BACKENDS = ("torch", "onnx", "openvino", "torchscript")
+DEFAULT_BACKEND = "torch"
+
+# backend‌هایی که با batch پویا export می‌شوند؛ torchscript با ورودی ثابت batch 1 trace می‌شود
+DYNAMIC_BACKENDS = ("onnx", "openvino")
+STATIC_BATCH_BACKENDS = ("torchscript",)
+
+# دقت محاسبات: fp32 (پیش‌فرض)، bf16 با autocast در torch و int8 با کوانتیزه کردن پویای مدل ONNX
+PRECISION_FP32 = "fp32"
+PRECISION_BF16 = "bf16"
+PRECISION_INT8 = "int8"
+PRECISIONS = (PRECISION_FP32, PRECISION_BF16, PRECISION_INT8)
+DEFAULT_PRECISION = PRECISION_FP32
+
+# پرچم‌های CPU که محاسبه bf16 را به صورت سخت‌افزاری پشتیبانی می‌کنند
+BF16_CPU_FLAGS = ("avx512_bf16", "amx_bf16")
+
+# وضعیت‌های بارگذاری مدل
+STATUS_LOADING = "loading"
+STATUS_WARMING = "warming"
+STATUS_READY = "ready"
+STATUS_ERROR = "error"
+
+# نشانه درخواست بارگذاری مجدد مدل در صف worker
+_RELOAD = object()
+
+
+def weights_for_tier(tier, weights_dir=WEIGHTS_DIR):
+    """مسیر وزن‌های یک نسخه مدل (n/s/m/l/x)"""
+    return os.path.join(weights_dir, f"yolo11{tier}.pt")
+
+
+def exported_path(weights, backend, imgsz):
+    """مسیر مدل export شده کنار فایل وزن‌ها؛ اندازه ورودی در نام فایل است چون export ثابت است"""
+    base = f"{os.path.splitext(weights)[0]}_{imgsz}"
+    if backend in DYNAMIC_BACKENDS:
+        # export‌های قدیمی batch 1 با این نام اشتباه گرفته نمی‌شوند
+        base += "_dynamic"
+    if backend == "openvino":
+        # ultralytics پوشه OpenVINO را از پسوند _openvino_model تشخیص می‌دهد
+        return f"{base}_openvino_model"
+    return f"{base}.{backend}"
+
+
+def export_model(weights, backend, imgsz):
+    """export یک باره مدل به backend داده‌شده و استفاده مجدد از خروجی‌های قبلی"""
+    target = exported_path(weights, backend, imgsz)
+    if os.path.exists(target) and (not os.path.exists(weights)
+                                   or os.path.getmtime(target) >= os.path.getmtime(weights)):
+        return target
+
+    from ultralytics import YOLO
+
+    exported = YOLO(weights).export(format=backend, imgsz=imgsz, dynamic=backend in DYNAMIC_BACKENDS)
+    if os.path.abspath(exported) != os.path.abspath(target):
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        shutil.move(exported, target)
+    return target
+
+
+def quantized_path(weights, imgsz):
+    """مسیر مدل ONNX کوانتیزه‌شده (int8) کنار فایل وزن‌ها"""
+    return f"{os.path.splitext(weights)[0]}_{imgsz}_dynamic_int8.onnx"
+
+
+def quantize_model(weights, imgsz):
+    """ساخت یک باره نسخه int8 مدل با کوانتیزه کردن پویای وزن‌های export ONNX
+
+    فعال‌سازی‌ها هنگام اجرا کوانتیزه می‌شوند، پس به داده calibration نیازی نیست.
+    """
+    source = export_model(weights, "onnx", imgsz)
+    target = quantized_path(weights, imgsz)
+    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+        return target
+
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    # ConvInteger در onnxruntime فقط وزن uint8 را پشتیبانی می‌کند
+    quantize_dynamic(source, target, weight_type=QuantType.QUInt8)
+    return target
+
+
+def prepare_model(weights, backend, imgsz, precision):
+    """ساخت فایل‌های export یا int8 مورد نیاز پیش از اجرای مدل در فرایندهای دیگر
+
+    در فرایند والد صدا زده می‌شود تا فرایندها همزمان روی یک فایل ننویسند و هزینه export
+    در حافظه و زمان فرایند اجرا حساب نشود.
+    """
+    if precision == PRECISION_INT8:
+        quantize_model(weights, imgsz)
+    elif backend != "torch":
+        export_model(weights, backend, imgsz)
+
+
+def bf16_supported():
+    """آیا CPU محاسبه bf16 را به صورت سخت‌افزاری پشتیبانی می‌کند"""
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            flags = set(next((line for line in f if line.startswith("flags")), "").split())
+        if flags:
+            return any(flag in flags for flag in BF16_CPU_FLAGS)
+    except OSError:
+        pass
+
+    import torch
+
+    # روی سیستم‌های غیر لینوکس از تشخیص oneDNN استفاده می‌شود
+    check = getattr(torch.ops.mkldnn, "_is_mkldnn_bf16_supported", None)
+    return bool(check and check())
+
+
+def _as_float32(output):
+    """تبدیل خروجی‌های bf16 شبکه (تنسور، tuple یا list) به float32 برای NMS"""
+    if isinstance(output, (list, tuple)):
+        return type(output)(_as_float32(item) for item in output)
+    if hasattr(output, "is_floating_point") and output.is_floating_point():
+        return output.float()
+    return output
+
+
+def enable_bf16(model):
+    """اجرای شبکه مدل با autocast bf16 روی CPU؛ پیش‌پردازش و NMS در float32 باقی می‌مانند"""
+    import torch
+
+    network = model.model
+    forward = network.forward
+
+    def bf16_forward(*args, **kwargs):
+        with torch.autocast("cpu", dtype=torch.bfloat16):
+            output = forward(*args, **kwargs)
+        return _as_float32(output)
+
+    network.forward = bf16_forward
+    return model
+
+
+def configure_threads(threads=None, interop_threads=None):
+    """تنظیم تعداد thread‌های محاسباتی (intra-op / inter-op)"""
+    if threads:
+        # کتابخانه‌هایی که هنوز import نشده‌اند این متغیرها را هنگام بارگذاری می‌خوانند
+        os.environ["OMP_NUM_THREADS"] = str(threads)
+        os.environ["MKL_NUM_THREADS"] = str(threads)
+
+    import torch
+
+    if threads:
+        torch.set_num_threads(threads)
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            # فقط قبل از شروع اولین کار موازی قابل تنظیم است
+            pass
+
+
+@contextmanager
+def runtime_threads(threads=None, interop_threads=None):
+    """اعمال تعداد thread به session‌های ONNX Runtime و OpenVINO که داخل این بلوک ساخته می‌شوند
+
+    ultralytics این session‌ها را بدون تنظیمات می‌سازد و این runtime‌ها OMP_NUM_THREADS را
+    نمی‌خوانند؛ به همین دلیل سازنده‌ها در این بازه با نسخه‌ای که تعداد thread را تنظیم می‌کند جایگزین می‌شوند.
+    """
+    patches = []
+    if threads or interop_threads:
+        try:
+            import onnxruntime
+        except ImportError:
+            onnxruntime = None
+        if onnxruntime is not None:
+            session_class = onnxruntime.InferenceSession
+
+            class ThreadedSession(session_class):
+                def __init__(self, path_or_bytes, sess_options=None, *args, **kwargs):
+                    sess_options = sess_options or onnxruntime.SessionOptions()
+                    if threads:
+                        sess_options.intra_op_num_threads = threads
+                    if interop_threads:
+                        sess_options.inter_op_num_threads = interop_threads
+                    super().__init__(path_or_bytes, sess_options, *args, **kwargs)
+
+            patches.append((onnxruntime, "InferenceSession", session_class, ThreadedSession))
+
+    if threads:
+        for module_name in ("openvino", "openvino.runtime"):
+            try:
+                module = __import__(module_name, fromlist=["Core"])
+                core_class = module.Core
+            except (ImportError, AttributeError):
+                continue
+
+            class ThreadedCore(core_class):
+                def compile_model(self, model, device_name=None, config=None, *args, **kwargs):
+                    config = dict(config or {}, INFERENCE_NUM_THREADS=threads)
+                    return super().compile_model(model, device_name, config, *args, **kwargs)
+
+            patches.append((module, "Core", core_class, ThreadedCore))
+
+    for module, name, _, replacement in patches:
+        setattr(module, name, replacement)
+    try:
+        yield
+    finally:
+        for module, name, original, _ in patches:
+            setattr(module, name, original)
+
+
+def load_model(weights=DEFAULT_WEIGHTS, backend=DEFAULT_BACKEND, imgsz=DEFAULT_IMGSZ,
+               precision=DEFAULT_PRECISION):
+    """بارگذاری مدل YOLO؛ import سنگین torch/ultralytics فقط همین‌جا انجام می‌شود
+
+    int8 همیشه با onnxruntime اجرا می‌شود (برای backend‌های torch و onnx) و bf16 فقط با torch.
+    """
+    from ultralytics import YOLO
+
+    if precision == PRECISION_INT8:
+        if backend not in ("torch", "onnx"):
+            raise ValueError(f"int8 precision is not available with the {backend} backend")
+        return YOLO(quantize_model(weights, imgsz), task="detect")
+
+    if precision == PRECISION_BF16:
+        if backend != "torch":
+            raise ValueError(f"bf16 precision is not available with the {backend} backend")
+        if not bf16_supported():
+            raise RuntimeError("This CPU has no native bf16 support")
+        return enable_bf16(YOLO(weights))
+
+    if backend == "torch":
+        return YOLO(weights)
+    return YOLO(export_model(weights, backend, imgsz), task="detect")
+
+
+def warmup_model(model, imgsz=DEFAULT_IMGSZ, **predict_kwargs):
+    """اجرای یک پیش‌بینی ساختگی تا هزینه تخصیص اولیه در اولین تصویر واقعی پرداخت نشود"""
+    import numpy as np
+
+    dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+    model.predict(source=dummy, imgsz=imgsz, **predict_kwargs)
+
+
+class DetectionEngine:
+    """مدل YOLO به همراه تنظیمات پیش‌بینی؛ بین رابط گرافیکی و حالت batch مشترک است"""
+
+    def __init__(self, weights=DEFAULT_WEIGHTS, imgsz=DEFAULT_IMGSZ, conf=DEFAULT_CONF, cache=None,
+                 backend=DEFAULT_BACKEND, threads=None, interop_threads=None, processes=1,
+                 precision=DEFAULT_PRECISION):
+        self.weights = weights
+        self.imgsz = imgsz
+        self.conf = conf
+        self.cache = cache
+        self.backend = backend
+        self.threads = threads
+        self.interop_threads = interop_threads
+        # تعداد فرایندهای پیش‌بینی؛ 1 یعنی داخل همین فرایند و 0 یعنی متناسب با تعداد هسته‌ها
+        self.processes = processes
+        self.precision = precision
+        self.model = None
+        self.pool = None
+        self._model_digest = None
+        # مدل بین thread‌های مختلف (پیش‌بینی تکی، ویدیو) مشترک است و همزمان اجرا نمی‌شود
+        self._lock = threading.Lock()
+
+    def configure(self, **settings):
+        """تغییر تنظیمات مدل (weights, imgsz, backend, threads, ...)؛ با load() بعدی اعمال می‌شود"""
+        for name, value in settings.items():
+            if not hasattr(self, name):
+                raise AttributeError(f"Unknown engine setting: {name}")
+            setattr(self, name, value)
+
+    def describe(self):
+        """خلاصه تنظیمات فعال برای نمایش در وضعیت سیستم"""
+        name = os.path.splitext(os.path.basename(self.weights))[0]
+        if self.pool is not None:
+            threads = f"{self.pool.workers} procs × {self.pool.threads} threads"
+        else:
+            threads = f"{self.threads} threads" if self.threads else "auto threads"
+        runtime = self.runtime if self.precision == PRECISION_FP32 else f"{self.runtime} {self.precision}"
+        return f"{name} · {runtime} · {self.imgsz}px · {threads}"
+
+    @property
+    def runtime(self):
+        """backend‌ای که مدل واقعا با آن اجرا می‌شود؛ int8 همیشه با onnxruntime اجرا می‌شود"""
+        return "onnx" if self.precision == PRECISION_INT8 else self.backend
+
+    @property
+    def names(self):
+        """نام کلاس‌های مدل"""
+        if self.pool is not None:
+            return self.pool.names
+        return self.model.names if self.model is not None else {}
+
+    @property
+    def loaded(self):
+        return self.model is not None or self.pool is not None
+
+    def load(self, warmup=True, on_status=None):
+        """بارگذاری مدل و در صورت نیاز گرم کردن آن
+
+        on_status در صورت وجود با STATUS_WARMING قبل از گرم کردن صدا زده می‌شود.
+        اگر processes برابر 1 نباشد مدل در فرایندهای جداگانه (InferencePool) بارگذاری می‌شود.
+        """
+        self.close()
+        if self.processes != 1:
+            self._start_pool(on_status)
+            return
+
+        configure_threads(self.threads, self.interop_threads)
+        with runtime_threads(self.threads, self.interop_threads):
+            model = load_model(self.weights, self.backend, self.imgsz, self.precision)
+            # session‌های ONNX Runtime / OpenVINO در اولین پیش‌بینی ساخته می‌شوند؛ برای اعمال
+            # تعداد thread این پیش‌بینی حتما داخل همین بلوک انجام می‌شود
+            if warmup or (self.threads and self.runtime != "torch"):
+                if on_status is not None:
+                    on_status(STATUS_WARMING)
+                warmup_model(model, self.imgsz, **self.predict_kwargs())
+
+        with self._lock:
+            self.model = model
+            self._model_digest = None
+
+    def _start_pool(self, on_status=None):
+        # export فقط یک بار در همین فرایند انجام می‌شود
+        prepare_model(self.weights, self.backend, self.imgsz, self.precision)
+        if on_status is not None:
+            on_status(STATUS_WARMING)
+        pool = InferencePool({"weights": self.weights, "imgsz": self.imgsz, "conf": self.conf,
+                              "backend": self.backend, "precision": self.precision},
+                             workers=self.processes, threads=self.threads)
+        pool.start()
+        with self._lock:
+            self.model = None
+            self.pool = pool
+            self._model_digest = None
+
+    def close(self):
+        """متوقف کردن فرایندهای پیش‌بینی (در صورت وجود)"""
+        with self._lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.close()
+
+    def predict_kwargs(self):
+        return {"save": False, "verbose": False, "conf": self.conf}
+
+    def predict(self, images):
+        """پیش‌بینی دسته‌ای روی لیستی از DecodedImage؛ یک نتیجه YOLO برای هر تصویر"""
+        if self.model is None:
+            if self.pool is not None:
+                raise RuntimeError("Raw YOLO results are not available with a process pool; use detect()")
+            raise RuntimeError("YOLO model not loaded")
+        # آرایه‌های decode شده مستقیما و به صورت یک batch به مدل داده می‌شوند
+        sources = [image.pixels for image in images]
+        with self._lock, profiler.stage("predict"):
+            if self.backend in STATIC_BATCH_BACKENDS:
+                # مدل با batch ثابت 1 export شده است؛ تصاویر یکی‌یکی به آن داده می‌شوند
+                results = [result for source in sources
+                           for result in self.model.predict(source=source, imgsz=self.imgsz,
+                                                            **self.predict_kwargs())]
+            else:
+                results = self.model.predict(source=sources, imgsz=self.imgsz, **self.predict_kwargs())
+        profiler.count("images", len(sources))
+        return results
+
+    def model_digest(self):
+        """hash وزن‌های مدل فعلی، backend و دقت محاسبات آن برای کلید cache"""
+        if self._model_digest is None:
+            self._model_digest = f"{weights_digest(self.weights)}-{self.backend}"
+            if self.precision != PRECISION_FP32:
+                self._model_digest += f"-{self.precision}"
+        return self._model_digest
+
+    def cache_key(self, image):
+        """کلید cache یک تصویر؛ برای تصاویری که hash محتوا ندارند (مثل فریم ویدیو) None"""
+        digest = getattr(image, "digest", None)
+        if digest is None:
+            return None
+        return cache_key(digest, self.model_digest(), self.conf, self.imgsz)
+
+    def detect(self, images):
+        """پیش‌بینی و تبدیل نتایج به Detections (یک رکورد ستونی برای هر تصویر)
+
+        اگر cache فعال باشد فقط تصاویری که قبلا تحلیل نشده‌اند به مدل داده می‌شوند.
+        """
+        keys, detections, missing = self._lookup(images)
+        if missing:
+            self._store(keys, detections, missing, self._infer([images[i] for i in missing]))
+        return detections
+
+    def detect_batches(self, batches):
+        """پیش‌بینی روی دنباله‌ای از batch‌ها؛ برای هر batch (لیست Detections، خطا) به ترتیب ورودی
+
+        در حالت چند فرایندی چند batch همزمان در جریان هستند تا هیچ فرایندی بیکار نماند.
+        """
+        if self.pool is None:
+            for images in batches:
+                try:
+                    yield self.detect(images), None
+                except Exception as e:
+                    yield None, e
+            return
+
+        pool = self.pool
+        pending = deque()
+        for images in batches:
+            keys, detections, missing = self._lookup(images)
+            try:
+                ticket = pool.submit([images[i] for i in missing]) if missing else []
+            except Exception as e:
+                ticket = e
+            pending.append((keys, detections, missing, ticket))
+            while pending and pool.in_flight >= 2 * pool.workers:
+                yield self._complete(*pending.popleft())
+        while pending:
+            yield self._complete(*pending.popleft())
+
+    def _complete(self, keys, detections, missing, ticket):
+        if isinstance(ticket, Exception):
+            return None, ticket
+        try:
+            if missing:
+                with profiler.stage("predict"):
+                    results = self.pool.gather(ticket)
+                profiler.count("images", len(results))
+                self._store(keys, detections, missing, results)
+        except Exception as e:
+            return None, e
+        return detections, None
+
+    def _infer(self, images):
+        """پیش‌بینی بدون cache؛ در همین فرایند یا در InferencePool"""
+        if self.pool is not None:
+            with profiler.stage("predict"):
+                results = self.pool.detect(images)
+            profiler.count("images", len(images))
+            return results
+
+        names = self.names
+        results = self.predict(images)
+        with profiler.stage("postprocess"):
+            return [Detections.from_result(result, names) for result in results]
+
+    def _lookup(self, images):
+        """خواندن نتایج موجود از cache؛ خروجی (کلیدها، Detections یا None، اندیس تصاویر ناموجود)"""
+        if self.cache is None:
+            return None, [None] * len(images), list(range(len(images)))
+
+        names = self.names
+        with profiler.stage("cache"):
+            keys = [self.cache_key(image) for image in images]
+            detections = [self.cache.get(key, names) if key is not None else None for key in keys]
+        return keys, detections, [i for i, item in enumerate(detections) if item is None]
+
+    def _store(self, keys, detections, missing, results):
+        for i, result in zip(missing, results):
+            detections[i] = result
+            if keys is not None and keys[i] is not None:
+                self.cache.put(keys[i], result)
+
+
+class InferenceResult:
+    """نتیجه یک درخواست پیش‌بینی که از thread پس‌زمینه برمی‌گردد"""
+
+    def __init__(self, request_id, image, detections=None, error=None, elapsed=0.0):
+        self.request_id = request_id
+        self.image = image
+        self.detections = detections
+        self.error = error
+        self.elapsed = elapsed
+
+
+class InferenceWorker:
+    """اجرای پیش‌بینی YOLO روی یک thread جداگانه تا حلقه اصلی Tk قفل نشود
+
+    مدل هم داخل همین thread بارگذاری و گرم می‌شود تا پنجره بلافاصله نمایش داده شود.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.status = STATUS_LOADING
+        self.error = None
+
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._current_id = 0
+
+        self._thread = threading.Thread(target=self._run, name="yolo-inference", daemon=True)
+        self._thread.start()
+
+    def submit(self, image, **tile_options):
+        """ارسال یک DecodedImage برای پیش‌بینی؛ درخواست‌های قبلی کهنه حساب می‌شوند
+
+        اگر tile_options (tile, overlap, ...) داده شود پیش‌بینی به صورت کاشی‌بندی‌شده انجام می‌شود.
+        """
+        with self._lock:
+            self._current_id += 1
+            request_id = self._current_id
+        self._requests.put((request_id, image, tile_options))
+        return request_id
+
+    def cancel(self):
+        """لغو درخواست جاری؛ نتیجه‌ای که بعدا برسد دور ریخته می‌شود"""
+        with self._lock:
+            self._current_id += 1
+
+    @property
+    def ready(self):
+        return self.status == STATUS_READY
+
+    @property
+    def names(self):
+        """نام کلاس‌های مدل"""
+        return self.engine.names
+
+    def is_current(self, request_id):
+        with self._lock:
+            return request_id == self._current_id
+
+    def poll(self):
+        """برگرداندن نتایج آماده‌ای که هنوز معتبر هستند (بدون بلاک شدن)"""
+        completed = []
+        while True:
+            try:
+                result = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if self.is_current(result.request_id):
+                completed.append(result)
+        return completed
+
+    def reload(self, **settings):
+        """بارگذاری مجدد مدل با تنظیمات جدید (نسخه، اندازه، backend، thread) بدون راه‌اندازی دوباره برنامه"""
+        self.cancel()
+        self.status = STATUS_LOADING
+        self._requests.put((_RELOAD, None, settings))
+
+    def stop(self):
+        """متوقف کردن thread پیش‌بینی"""
+        self.cancel()
+        self._requests.put(None)
+
+    def _set_status(self, status):
+        self.status = status
+
+    def _load(self, **settings):
+        """بارگذاری و گرم کردن مدل داخل thread پس‌زمینه"""
+        try:
+            self.status = STATUS_LOADING
+            self.error = None
+            self.engine.configure(**settings)
+            self.engine.load(on_status=self._set_status)
+            self.status = STATUS_READY
+        except Exception as e:
+            self.error = e
+            self.status = STATUS_ERROR
+
+    def _run(self):
+        self._load()
+
+        while True:
+            item = self._requests.get()
+            if item is None:
+                self.engine.close()
+                break
+
+            request_id, image, options = item
+            if request_id is _RELOAD:
+                self._load(**options)
+                continue
+
+            # درخواست‌هایی که قبل از شروع لغو شده‌اند اجرا نمی‌شوند
+            if not self.is_current(request_id):
+                continue
+
+            start_time = time.perf_counter()
+            try:
+                if not self.engine.loaded:
+                    raise RuntimeError(f"YOLO model not available: {self.error}")
+                with profiler.capture():
+                    if options:
+                        detections = detect_tiled(self.engine, image.path, **options)
+                    else:
+                        detections = self.engine.detect([image])[0]
+                result = InferenceResult(request_id, image, detections=detections,
+                                         elapsed=time.perf_counter() - start_time)
+            except Exception as e:
+                result = InferenceResult(request_id, image, error=e,
+                                         elapsed=time.perf_counter() - start_time)
+
+            self._results.put(result)
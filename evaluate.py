@@ -0,0 +1,257 @@
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from batch import collect_image_paths
+from benchmark import percentiles, peak_rss_mb
+from engine import (DetectionEngine, weights_for_tier, exported_path, quantized_path, prepare_model,
+                    DEFAULT_WEIGHTS, DEFAULT_BACKEND, DEFAULT_IMGSZ, DEFAULT_CONF, MODEL_TIERS, PRECISION_FP32,
+                    PRECISION_BF16, PRECISION_INT8)
+from imaging import DecodedImage
+from profiling import memory_mb
+from tiling import box_iou
+
+# دقت‌های کاهش‌یافته‌ای که با مرجع fp32 مقایسه می‌شوند
+REDUCED_PRECISIONS = (PRECISION_INT8, PRECISION_BF16)
+
+# حداقل IoU برای یکسان حساب کردن دو کادر هم‌کلاس
+DEFAULT_MATCH_IOU = 0.5
+
+
+def model_files(weights, imgsz, precision):
+    """فایل مدل هر حالت و فایل fp32 هم‌قالب آن برای مقایسه حجم
+
+    int8 با export ONNX با دقت fp32 مقایسه می‌شود، نه با checkpoint ‎.pt که قالب دیگری دارد.
+    """
+    if precision == PRECISION_INT8:
+        return quantized_path(weights, imgsz), exported_path(weights, "onnx", imgsz)
+    return weights, weights
+
+
+def _size_mb(path):
+    return os.path.getsize(path) / (1024 * 1024) if os.path.isfile(path) else None
+
+
+def run_precision(settings, precision, paths, warmup):
+    """اجرای همه تصاویر با یک دقت؛ در فرایندی جداگانه تا حافظه هر حالت مستقل اندازه‌گیری شود
+
+    تصاویر یکی‌یکی decode می‌شوند تا حافظه به تعداد تصاویر بستگی نداشته باشد؛ فایل‌هایی که
+    decode یا تحلیل نمی‌شوند کنار گذاشته و گزارش می‌شوند.
+    """
+    # حافظه فعلی (نه بیشترین مقدار) پیش و پس از بارگذاری؛ فایل int8 از قبل در فرایند والد ساخته شده است
+    rss_before = memory_mb()
+    engine = DetectionEngine(precision=precision, **settings)
+
+    start_time = time.perf_counter()
+    engine.load(warmup=True)
+    load_time = time.perf_counter() - start_time
+    # حافظه مدل پیش از نگه داشتن هیچ تصویری اندازه‌گیری می‌شود
+    load_rss = memory_mb()
+
+    # تاخیر هر تصویر به صورت تکی (batch 1) و بدون زمان decode اندازه‌گیری می‌شود
+    latencies, detections, failed = [], {}, []
+    for index, path in enumerate(paths):
+        try:
+            image = DecodedImage.open(path)
+            image.pixels
+            if index < warmup:
+                engine.detect([image])
+            start_time = time.perf_counter()
+            items = engine.detect([image])[0]
+        except Exception as e:
+            failed.append({"image": path, "error": str(e)})
+            continue
+        finally:
+            image = None
+        latencies.append((time.perf_counter() - start_time) * 1000)
+        detections[path] = (items.xyxy, items.conf, items.cls)
+    if not detections:
+        raise RuntimeError(f"none of the {len(paths)} images could be processed")
+
+    path, fp32_path = model_files(settings["weights"], settings["imgsz"], precision)
+    return {"precision": precision, "load_s": load_time, "images": len(detections), "failed": failed,
+            "latency_ms": percentiles(latencies),
+            "model_mb": _size_mb(path), "model_fp32_mb": _size_mb(fp32_path),
+            "load_rss_mb": load_rss,
+            "model_rss_mb": load_rss - rss_before if load_rss is not None and rss_before is not None else None,
+            "peak_rss_mb": peak_rss_mb(),
+            "names": dict(engine.names), "detections": detections}
+
+
+def match_boxes(reference, candidate, iou=DEFAULT_MATCH_IOU):
+    """تطبیق حریصانه کادرهای هم‌کلاس دو نتیجه؛ IoU کادرهای مرجعی که جفت پیدا کردند
+
+    کادرهای مرجع به ترتیب confidence بررسی می‌شوند و هر کادر کاندید حداکثر یک بار استفاده می‌شود.
+    """
+    ref_xyxy, ref_conf, ref_cls = reference
+    xyxy, _, cls = candidate
+    used = np.zeros(len(cls), dtype=bool)
+    matched = np.full(len(ref_cls), np.nan)
+    for i in np.argsort(-ref_conf):
+        options = np.flatnonzero((cls == ref_cls[i]) & ~used)
+        if options.size == 0:
+            continue
+        overlaps = box_iou(ref_xyxy[i], xyxy[options])
+        best = int(np.argmax(overlaps))
+        if overlaps[best] >= iou:
+            used[options[best]] = True
+            matched[i] = overlaps[best]
+    return matched
+
+
+def compare(reference, candidate, names, iou=DEFAULT_MATCH_IOU):
+    """تغییر تعداد و confidence هر کلاس و میزان توافق کادرها نسبت به مرجع fp32"""
+    classes = {}
+    matched_ious = []
+    identical = 0
+    for ref, cand in zip(reference, candidate):
+        matched = match_boxes(ref, cand, iou)
+        matched_ious.extend(matched[~np.isnan(matched)])
+        identical += int(np.array_equal(np.sort(ref[2]), np.sort(cand[2])))
+
+        for side, (_, conf, cls) in (("reference", ref), ("candidate", cand)):
+            for class_id in np.unique(cls):
+                stats = classes.setdefault(int(class_id), {"reference": [], "candidate": [], "matched": 0})
+                stats[side].extend(conf[cls == class_id].tolist())
+        for class_id in ref[2][~np.isnan(matched)]:
+            classes[int(class_id)]["matched"] += 1
+
+    per_class = []
+    for class_id, stats in sorted(classes.items(), key=lambda item: -len(item[1]["reference"])):
+        ref_conf, cand_conf = stats["reference"], stats["candidate"]
+        ref_mean = float(np.mean(ref_conf)) if ref_conf else None
+        cand_mean = float(np.mean(cand_conf)) if cand_conf else None
+        per_class.append({
+            "class": names.get(class_id, str(class_id)),
+            "count_fp32": len(ref_conf), "count": len(cand_conf), "count_delta": len(cand_conf) - len(ref_conf),
+            "mean_conf_fp32": ref_mean, "mean_conf": cand_mean,
+            "mean_conf_delta": cand_mean - ref_mean if ref_mean is not None and cand_mean is not None else None,
+            "matched": stats["matched"],
+        })
+
+    total_ref = sum(len(item[2]) for item in reference)
+    total_cand = sum(len(item[2]) for item in candidate)
+    return {
+        "boxes_fp32": total_ref, "boxes": total_cand,
+        # سهم کادرهای دو طرف که جفت هم‌کلاس با IoU کافی دارند (مشابه F1)
+        "box_agreement": 2 * len(matched_ious) / (total_ref + total_cand) if total_ref + total_cand else 1.0,
+        "mean_iou": float(np.mean(matched_ious)) if matched_ious else None,
+        "identical_count_images": identical / max(len(reference), 1),
+        "per_class": per_class,
+    }
+
+
+def summarize(reference, result, iou=DEFAULT_MATCH_IOU):
+    """گزارش یک حالت: سرعت و حافظه نسبت به fp32 و تغییر تشخیص‌ها"""
+    summary = {key: value for key, value in result.items() if key not in ("names", "detections")}
+    if "error" in result:
+        return summary
+
+    summary["speedup"] = reference["latency_ms"]["p50"] / result["latency_ms"]["p50"]
+    if result["model_mb"] is not None and result["model_fp32_mb"] is not None:
+        summary["model_mb_saved"] = result["model_fp32_mb"] - result["model_mb"]
+    for key in ("model_rss_mb", "peak_rss_mb"):
+        if reference.get(key) is not None and result.get(key) is not None:
+            summary[f"{key}_saved"] = reference[key] - result[key]
+    if result["precision"] != PRECISION_FP32:
+        # فقط تصاویری مقایسه می‌شوند که در هر دو حالت تحلیل شده‌اند
+        paths = [path for path in reference["detections"] if path in result["detections"]]
+        summary["compared_images"] = len(paths)
+        summary.update(compare([reference["detections"][path] for path in paths],
+                               [result["detections"][path] for path in paths], reference["names"], iou))
+    return summary
+
+
+def _format(value, pattern):
+    return "-" if value is None else pattern.format(value)
+
+
+def format_report(summaries):
+    """جدول متنی خلاصه برای نمایش در ترمینال"""
+    lines = [f"{'mode':<6}{'p50 ms':>10}{'speedup':>9}{'model MB':>10}{'model RSS':>11}{'peak RSS':>10}"
+             f"{'agree':>8}{'mean IoU':>10}{'same counts':>13}"]
+    for summary in summaries:
+        if "error" in summary:
+            lines.append(f"{summary['precision']:<6}  error: {summary['error']}")
+            continue
+        lines.append(f"{summary['precision']:<6}{summary['latency_ms']['p50']:>10.1f}"
+                     f"{summary['speedup']:>8.2f}x{_format(summary['model_mb'], '{:.1f}'):>10}"
+                     f"{_format(summary['model_rss_mb'], '{:.0f}'):>11}"
+                     f"{_format(summary['peak_rss_mb'], '{:.0f}'):>10}"
+                     f"{_format(summary.get('box_agreement'), '{:.1%}'):>8}"
+                     f"{_format(summary.get('mean_iou'), '{:.3f}'):>10}"
+                     f"{_format(summary.get('identical_count_images'), '{:.1%}'):>13}")
+    for summary in summaries:
+        if summary.get("failed"):
+            lines.append(f"{summary['precision']}: skipped {len(summary['failed'])} images that could not be "
+                         f"processed (first: {summary['failed'][0]['image']}: {summary['failed'][0]['error']})")
+
+    for summary in summaries:
+        if "per_class" not in summary:
+            continue
+        lines.append("")
+        lines.append(f"{summary['precision']} vs fp32: {'class':<16}{'count':>14}{'mean conf':>26}{'matched':>9}")
+        for item in summary["per_class"]:
+            counts = f"{item['count_fp32']}→{item['count']} ({item['count_delta']:+d})"
+            confidence = (f"{_format(item['mean_conf_fp32'], '{:.3f}')}→{_format(item['mean_conf'], '{:.3f}')}"
+                          f" ({_format(item['mean_conf_delta'], '{:+.3f}')})")
+            lines.append(f"{'':<{len(summary['precision']) + 10}}{item['class']:<16}{counts:>14}"
+                         f"{confidence:>26}{item['matched']:>9}")
+    return "\n".join(lines)
+
+
+def add_arguments(parser):
+    """آرگومان‌های خط فرمان ارزیابی دقت‌های کاهش‌یافته"""
+    parser.add_argument("inputs", nargs="+", help="image files, folders, glob patterns or .txt path lists")
+    parser.add_argument("--recursive", action="store_true", help="search folders recursively")
+    parser.add_argument("--limit", type=int, help="evaluate at most this many images")
+    parser.add_argument("--precisions", nargs="+", choices=REDUCED_PRECISIONS, default=list(REDUCED_PRECISIONS),
+                        help="reduced precisions to compare against fp32")
+    parser.add_argument("--weights", default=DEFAULT_WEIGHTS)
+    parser.add_argument("--model", choices=MODEL_TIERS, help="model tier (overrides --weights)")
+    parser.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ)
+    parser.add_argument("--conf", type=float, default=DEFAULT_CONF)
+    parser.add_argument("--threads", type=int, help="intra-op threads")
+    parser.add_argument("--warmup", type=int, default=3, help="warm-up images per mode (not measured)")
+    parser.add_argument("--match-iou", type=float, default=DEFAULT_MATCH_IOU,
+                        help="IoU for a box to count as the same detection")
+    parser.add_argument("-o", "--output", help="also write the full report as JSON")
+
+
+def run(args):
+    """اجرای fp32 و دقت‌های کاهش‌یافته روی تصاویر و گزارش سرعت، حافظه و تغییر تشخیص‌ها"""
+    paths = collect_image_paths(args.inputs, recursive=args.recursive)[:args.limit]
+    if not paths:
+        print("No images found", file=sys.stderr)
+        return 1
+
+    settings = {"weights": weights_for_tier(args.model) if args.model else args.weights, "imgsz": args.imgsz,
+                "conf": args.conf, "threads": args.threads}
+    results = []
+    for precision in [PRECISION_FP32] + [p for p in args.precisions if p != PRECISION_FP32]:
+        print(f"Evaluating {precision} on {len(paths)} images", file=sys.stderr)
+        try:
+            # export و کوانتیزه کردن در همین فرایند تا در زمان و حافظه فرایند اندازه‌گیری حساب نشوند
+            prepare_model(settings["weights"], DEFAULT_BACKEND, settings["imgsz"], precision)
+            # هر حالت در یک فرایند تازه اجرا می‌شود تا حافظه و thread‌های آن مستقل باشند
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                result = pool.submit(run_precision, settings, precision, paths, args.warmup).result()
+        except Exception as e:
+            if precision == PRECISION_FP32:
+                print(f"fp32 reference failed: {e}", file=sys.stderr)
+                return 1
+            result = {"precision": precision, "error": str(e)}
+        results.append(result)
+
+    summaries = [summarize(results[0], result, args.match_iou) for result in results]
+    print(format_report(summaries))
+    if args.output:
+        report = {"images": len(paths), "settings": settings, "match_iou": args.match_iou, "results": summaries}
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
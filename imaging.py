@@ -0,0 +1,212 @@
+import hashlib
+import io
+import os
+import threading
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+import numpy as np
+
+from cache import file_digest
+from profiling import profiler
+
+# اندازه پیش‌فرض پیش‌نمایش در رابط گرافیکی
+PREVIEW_SIZE = 500
+
+# رنگ کادرها بر اساس کلاس
+PALETTE = ('#FF0000', '#00FF00', '#0000FF', '#FFFF00', '#FF00FF',
+           '#00FFFF', '#FFA500', '#800080', '#008000', '#800000')
+
+# اندازه فونت برچسب‌ها در اندازه پیش‌نمایش
+LABEL_FONT_SIZE = 13
+
+# پسوندهای تصویری که در پوشه‌ها جستجو می‌شوند
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+
+
+def is_image_file(path):
+    return path.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def file_signature(path):
+    """امضای (mtime، اندازه) یک فایل؛ با تغییر هر کدام نتایج قبلی آن فایل معتبر نیستند"""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def fit_size(width, height, max_size):
+    """محاسبه اندازه جدید با حفظ نسبت ابعاد به طوری که ضلع بزرگ‌تر max_size شود"""
+    if width > height:
+        return max_size, int(height * (max_size / width))
+    return int(width * (max_size / height)), max_size
+
+
+def resize_to_fit(image, max_size, resample=Image.Resampling.LANCZOS):
+    """تغییر سایز تصویر برای نمایش"""
+    return image.resize(fit_size(image.width, image.height, max_size), resample)
+
+
+class DecodedImage:
+    """تصویری که فقط یک بار decode می‌شود و بین پیش‌نمایش، مدل و رسم کادرها مشترک است
+
+    image: تصویر PIL در حالت RGB (برای پیش‌نمایش و رسم)
+    pixels: آرایه پیوسته BGR با شکل (H, W, 3) که مستقیما به عنوان source به YOLO داده می‌شود
+    """
+
+    def __init__(self, path, image, size=None):
+        self.path = path
+        self.name = path
+        self._image = image
+        self._size = image.size if image is not None else size
+        self._lock = threading.Lock()
+        self._pixels = None
+        self._digest = None
+        self._previews = {}
+
+    @staticmethod
+    def _decode(path):
+        # با باز کردن از روی مسیر، PIL فرمت‌های فشرده‌نشده را memory-map می‌کند
+        image = Image.open(path)
+        image.load()
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        return image
+
+    @classmethod
+    def open(cls, path):
+        """خواندن و decode کردن فایل تصویر"""
+        return cls(path, cls._decode(path))
+
+    @classmethod
+    def deferred(cls, path):
+        """فقط خواندن header فایل؛ decode کامل در اولین استفاده از image یا pixels انجام می‌شود"""
+        with Image.open(path) as image:
+            size = image.size
+        return cls(path, None, size=size)
+
+    @classmethod
+    def from_bytes(cls, data, name=None):
+        """decode کردن تصویر از بایت‌های فایل (مثلا آپلود HTTP)؛ hash از همین بایت‌ها گرفته می‌شود"""
+        image = Image.open(io.BytesIO(data))
+        image.load()
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        decoded = cls(None, image)
+        decoded.name = name
+        decoded._digest = hashlib.sha256(data).hexdigest()
+        return decoded
+
+    @property
+    def image(self):
+        if self._image is None:
+            with self._lock:
+                if self._image is None:
+                    with profiler.stage("decode"):
+                        self._image = self._decode(self.path)
+        return self._image
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def digest(self):
+        """hash محتوای فایل برای cache نتایج (فقط یک بار محاسبه می‌شود)"""
+        if self._digest is None and self.path is not None:
+            self._digest = file_digest(self.path)
+        return self._digest
+
+    @property
+    def pixels(self):
+        """آرایه BGR مورد انتظار YOLO؛ فقط یک بار و بدون کپی میانی ساخته می‌شود"""
+        if self._pixels is None:
+            width, height = self.image.size
+            # تبدیل RGB به BGR در همان مرحله خروجی گرفتن از PIL انجام می‌شود
+            buffer = self.image.tobytes("raw", "BGR")
+            self._pixels = np.frombuffer(buffer, dtype=np.uint8).reshape(height, width, 3)
+        return self._pixels
+
+    def preview(self, max_size=PREVIEW_SIZE):
+        """پیش‌نمایش کوچک‌شده تصویر (با cache)"""
+        preview = self._previews.get(max_size)
+        if preview is None:
+            preview = resize_to_fit(self.image, max_size)
+            self._previews[max_size] = preview
+        return preview
+
+    def set_preview(self, max_size, preview):
+        """استفاده از پیش‌نمایشی که جای دیگری ساخته شده (مثلا PreviewLoader) به جای کوچک کردن دوباره"""
+        self._previews[max_size] = preview
+
+
+@lru_cache(maxsize=None)
+def load_font(size):
+    """بارگذاری فونت برچسب‌ها (فقط یک بار برای هر اندازه)"""
+    for name in ("arial.ttf", "DejaVuSans.ttf"):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            pass
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:
+        return ImageFont.load_default()
+
+
+def color_for_class(class_id):
+    """رنگ ثابت هر کلاس"""
+    return PALETTE[class_id % len(PALETTE)]
+
+
+class AnnotationRenderer:
+    """رسم کادرها در اندازه پیش‌نمایش به جای رسم روی تصویر اصلی و کوچک کردن آن
+
+    فونت، رنگ‌ها و اندازه متن برچسب‌ها cache می‌شوند.
+    """
+
+    # حداکثر تعداد اندازه متن‌های ذخیره‌شده
+    MAX_CACHED_LABELS = 4096
+
+    def __init__(self, font_size=LABEL_FONT_SIZE, line_width=2):
+        self.font = load_font(font_size)
+        self.line_width = line_width
+        self._text_sizes = {}
+
+    def text_size(self, label):
+        """عرض و ارتفاع متن برچسب (با cache)"""
+        size = self._text_sizes.get(label)
+        if size is None:
+            if len(self._text_sizes) >= self.MAX_CACHED_LABELS:
+                self._text_sizes.clear()
+            bbox = self.font.getbbox(label)
+            size = (bbox[2] - bbox[0], bbox[3] - bbox[1])
+            self._text_sizes[label] = size
+        return size
+
+    def draw(self, image, detections, scale=1.0):
+        """رسم bounding box و برچسب‌ها روی تصویر (در همان تصویر)"""
+        draw = ImageDraw.Draw(image)
+
+        # مقیاس مختصات یک بار و به صورت برداری اعمال می‌شود
+        xyxy = (detections.xyxy * scale).tolist() if scale != 1.0 else detections.xyxy.tolist()
+
+        for (x1, y1, x2, y2), confidence, class_id in zip(xyxy, detections.conf.tolist(),
+                                                          detections.cls.tolist()):
+            color = color_for_class(class_id)
+
+            # رسم مستطیل
+            draw.rectangle([x1, y1, x2, y2], outline=color, width=self.line_width)
+
+            # متن برچسب و پس‌زمینه آن
+            label = f"{detections.names[class_id]} {confidence:.2f}"
+            text_width, text_height = self.text_size(label)
+            draw.rectangle([x1, y1 - text_height - 4, x1 + text_width + 6, y1], fill=color)
+            draw.text((x1 + 3, y1 - text_height - 2), label, fill='white', font=self.font)
+
+        return image
+
+    def render(self, decoded_image, detections, max_size=PREVIEW_SIZE):
+        """ساخت پیش‌نمایش با کادرها: ابتدا کوچک کردن، سپس رسم در مختصات پیش‌نمایش"""
+        preview = decoded_image.preview(max_size).copy()
+        scale = preview.width / decoded_image.size[0]
+        return self.draw(preview, detections, scale)
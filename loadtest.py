@@ -0,0 +1,105 @@
+import asyncio
+import json
+import os
+import sys
+import time
+
+from benchmark import SAMPLE_IMAGE, percentiles
+from server import DEFAULT_HOST, DEFAULT_PORT
+
+
+async def request(reader, writer, method, path, body=b"", host=DEFAULT_HOST):
+    """ارسال یک درخواست HTTP/1.1 روی اتصال keep-alive و خواندن پاسخ (کد وضعیت، بدنه)"""
+    head = (f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(body)}\r\n"
+            f"Content-Type: application/octet-stream\r\n\r\n")
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+
+    lines = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    length = 0
+    for line in lines[1:]:
+        if line.lower().startswith("content-length:"):
+            length = int(line.split(":", 1)[1])
+    return status, await reader.readexactly(length)
+
+
+async def fetch_json(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        _, body = await request(reader, writer, "GET", path, host=host)
+        return json.loads(body)
+    finally:
+        writer.close()
+
+
+async def client(host, port, payload, deadline, latencies, statuses):
+    """یک کاربر همزمان: ارسال پشت سر هم درخواست‌ها تا پایان زمان آزمون"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            start_time = time.perf_counter()
+            status, _ = await request(reader, writer, "POST", "/detect", payload, host=host)
+            latencies.append((time.perf_counter() - start_time) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 503:
+                # رعایت backpressure سرور
+                await asyncio.sleep(0.05)
+    finally:
+        writer.close()
+
+
+async def run_level(host, port, payload, concurrency, duration):
+    """اجرای آزمون با تعداد مشخصی کاربر همزمان و برگرداندن آمار"""
+    before = await fetch_json(host, port, "/metrics")
+    latencies, statuses = [], {}
+
+    start_time = time.perf_counter()
+    deadline = start_time + duration
+    await asyncio.gather(*(client(host, port, payload, deadline, latencies, statuses)
+                           for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start_time
+
+    after = await fetch_json(host, port, "/metrics")
+    batches = after["batches"] - before["batches"]
+    images = after["images"] - before["images"]
+    return {"concurrency": concurrency, "requests": len(latencies), "statuses": statuses,
+            "requests_per_sec": statuses.get(200, 0) / elapsed,
+            "latency_ms": percentiles(latencies),
+            "mean_batch_size": images / batches if batches else 0.0}
+
+
+async def run_levels(args, payload):
+    results = []
+    for concurrency in args.concurrency:
+        print(f"Load testing with {concurrency} concurrent clients", file=sys.stderr)
+        results.append(await run_level(args.host, args.port, payload, concurrency, args.duration))
+    return results
+
+
+def add_arguments(parser):
+    """آرگومان‌های خط فرمان آزمون بار"""
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--image", default=SAMPLE_IMAGE,
+                        help=f"image to upload (default: {os.path.basename(SAMPLE_IMAGE)})")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 2, 4, 8, 16])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument("-o", "--output", help="JSON output file (default: stdout)")
+
+
+def run(args):
+    """اجرای آزمون بار روی سرویس HTTP در حال اجرا"""
+    with open(args.image, "rb") as f:
+        payload = f.read()
+
+    results = asyncio.run(run_levels(args, payload))
+    report = {"server": f"http://{args.host}:{args.port}", "image": os.path.basename(args.image),
+              "duration_s": args.duration, "results": results}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
@@ -1,11 +1,45 @@
+import argparse
+import sys
+import threading
 import tkinter as tk
 from tkinter import ttk, filedialog
-from PIL import Image, ImageTk, ImageDraw, ImageFont
-import torch
-from ultralytics import YOLO
+from PIL import ImageTk
 import numpy as np
 import os
 
+from engine import (DetectionEngine, InferenceWorker, weights_for_tier,
+                    BACKENDS, DEFAULT_BACKEND, DEFAULT_IMGSZ, DEFAULT_PRECISION, IMAGE_SIZES, MODEL_TIERS,
+                    PRECISIONS,
+                    STATUS_LOADING, STATUS_WARMING, STATUS_READY, STATUS_ERROR)
+from cache import DetectionCache, DEFAULT_CACHE_PATH
+from imaging import AnnotationRenderer, DecodedImage, PREVIEW_SIZE
+from preview import PreviewLoader, folder_images, neighbours, QUALITY_REFINED
+from profiling import profiler, memory_mb, CAPTURE_CPROFILE, CAPTURE_TORCH
+from ranking_view import RankingView
+from store import DetectionStore, DEFAULT_STORE_PATH
+from streaming import StreamPipeline, VIDEO_EXTENSIONS
+from tiling import DEFAULT_TILE_SIZE
+from watch import Manifest, WatchPipeline, format_log_line
+
+# فاصله زمانی بررسی نتایج پیش‌بینی (میلی‌ثانیه)
+POLL_INTERVAL_MS = 50
+
+# فاصله زمانی بررسی فریم‌های جدید ویدیو (میلی‌ثانیه)
+STREAM_POLL_INTERVAL_MS = 15
+
+# اندازه‌های قابل انتخاب کاشی
+TILE_SIZES = (320, 480, 640, 960, 1280)
+
+# فاصله زمانی به‌روزرسانی پنل کارایی (میلی‌ثانیه)
+PERF_PANEL_INTERVAL_MS = 500
+
+# فاصله زمانی بررسی نتایج حالت watch و حداکثر خطوط گزارش آن
+WATCH_POLL_INTERVAL_MS = 200
+WATCH_LOG_LINES = 500
+
+# فاصله زمانی بررسی ذخیره خودکار store نتایج (میلی‌ثانیه)
+STORE_AUTOSAVE_CHECK_MS = 5000
+
 
 class ImageViewerGUI:
     def __init__(self, root):
@@ -23,20 +57,95 @@ class ImageViewerGUI:
         self.style.configure('TButton', font=('Arial', 10))
         self.style.configure('Accent.TButton', background='#007acc', foreground='white')
 
-        # بارگذاری مدل YOLO
-        self.model = None
-        self.load_model()
+        # بارگذاری مدل YOLO و اجرای پیش‌بینی در پس‌زمینه
+        self.worker = None
+        self.model_status = None
+        self.pending_request = None
+        self.renderer = AnnotationRenderer()
+        self.stream = None
+        self.watch = None
+        self.watch_stopper = None
+        self.watch_stop_callbacks = []
+
+        # پیش‌نمایش سریع تصاویر با cache و پیش‌خوانی فایل‌های همسایه
+        self.previews = PreviewLoader(PREVIEW_SIZE)
+
+        # ذخیره ستونی نتایج همه تحلیل‌ها برای جستجو بدون اجرای دوباره مدل
+        self.store = self.open_store()
 
         self.setup_ui()
+        self.load_model()
+
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(POLL_INTERVAL_MS, self.poll_inference)
+        self.root.after(STORE_AUTOSAVE_CHECK_MS, self.autosave_store)
 
     def load_model(self):
-        """بارگذاری مدل YOLO"""
+        """شروع بارگذاری مدل YOLO در پس‌زمینه؛ وضعیت در poll_inference به‌روز می‌شود"""
+        self.worker = InferenceWorker(DetectionEngine(cache=self.create_cache()))
+        self.update_model_status()
+
+    def create_cache(self):
+        """ساخت cache نتایج؛ اگر فایل روی دیسک قابل استفاده نباشد فقط در حافظه نگه داشته می‌شود"""
         try:
-            self.model = YOLO("YOLO11/yolo11x.pt")
-            print("مدل YOLO با موفقیت بارگذاری شد")
+            return DetectionCache(path=DEFAULT_CACHE_PATH)
+        except Exception as e:
+            print(f"خطا در باز کردن cache روی دیسک: {e}")
+            return DetectionCache()
+
+    def open_store(self):
+        """باز کردن store نتایج؛ در صورت خطا فقط در حافظه نگه داشته می‌شود"""
+        try:
+            return DetectionStore.open(DEFAULT_STORE_PATH)
+        except Exception as e:
+            print(f"خطا در باز کردن store نتایج: {e}")
+            return DetectionStore()
+
+    def autosave_store(self):
+        """ذخیره دوره‌ای store تا با بسته شدن غیرعادی برنامه نتایج جلسه از دست نروند"""
+        try:
+            self.store.maybe_save()
         except Exception as e:
-            print(f"خطا در بارگذاری مدل: {e}")
-            self.model = None
+            print(f"خطا در ذخیره store نتایج: {e}")
+        self.root.after(STORE_AUTOSAVE_CHECK_MS, self.autosave_store)
+
+    def apply_model_settings(self):
+        """بارگذاری مجدد مدل با نسخه، اندازه ورودی، backend، دقت، تعداد thread و فرایند انتخاب‌شده"""
+        self.stop_stream()
+        self.cancel_inference()
+        # مدل فقط پس از پایان دسته در حال پردازش watch عوض می‌شود
+        self.stop_watch(then=self.reload_model)
+
+    def reload_model(self):
+        """ارسال تنظیمات انتخاب‌شده مدل به worker برای بارگذاری مجدد در پس‌زمینه"""
+        threads = self.model_threads.get()
+        processes = self.model_processes.get()
+        self.worker.reload(weights=weights_for_tier(self.model_tier.get()),
+                           imgsz=int(self.model_imgsz.get()),
+                           backend=self.model_backend.get(),
+                           precision=self.model_precision.get(),
+                           threads=None if threads == "auto" else int(threads),
+                           processes=0 if processes == "auto" else int(processes))
+        self.update_model_status()
+
+    def update_model_status(self):
+        """نمایش وضعیت بارگذاری مدل در کارت System Status"""
+        status = self.worker.status
+        if status == self.model_status:
+            return
+        self.model_status = status
+
+        if status == STATUS_LOADING:
+            self.model_status_label.configure(text="YOLO11: ⏳ Loading model...", foreground="orange")
+        elif status == STATUS_WARMING:
+            self.model_status_label.configure(text="YOLO11: 🔥 Warming up...", foreground="orange")
+        elif status == STATUS_READY:
+            self.model_status_label.configure(text="YOLO11: ✅ Model Loaded", foreground="green")
+            self.backend_status_label.configure(text=f"Active: {self.worker.engine.describe()}")
+            print("مدل YOLO با موفقیت بارگذاری شد")
+        elif status == STATUS_ERROR:
+            self.model_status_label.configure(text="YOLO11: ❌ Model Not Available", foreground="red")
+            print(f"خطا در بارگذاری مدل: {self.worker.error}")
 
     def setup_ui(self):
         # هدر برنامه
@@ -72,13 +181,73 @@ class ImageViewerGUI:
         self.file_entry = ttk.Entry(file_input_frame, textvariable=self.file_path, font=('Arial', 10))
         self.file_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, ipady=3)
 
+        # مرور تصاویر پوشه (کلیدهای PageUp / PageDown)
+        ttk.Button(file_input_frame, text="▶", width=2,
+                   command=lambda: self.show_neighbour(1)).pack(side=tk.RIGHT, padx=(2, 0))
+        ttk.Button(file_input_frame, text="◀", width=2,
+                   command=lambda: self.show_neighbour(-1)).pack(side=tk.RIGHT, padx=(5, 0))
+
         self.browse_btn = ttk.Button(file_input_frame, text="Browse", command=self.browse_image)
         self.browse_btn.pack(side=tk.RIGHT, padx=(10, 0))
 
+        # پیش‌بینی کاشی‌بندی‌شده برای تصاویر بسیار بزرگ
+        tile_frame = ttk.Frame(file_card)
+        tile_frame.pack(fill=tk.X, pady=(8, 0))
+
+        self.tiled_inference = tk.BooleanVar(value=False)
+        ttk.Checkbutton(tile_frame, text="Tiled inference", variable=self.tiled_inference).pack(side=tk.LEFT)
+
+        self.tile_size = tk.StringVar(value=str(DEFAULT_TILE_SIZE))
+        ttk.Combobox(tile_frame, textvariable=self.tile_size, values=TILE_SIZES,
+                     width=6, state='readonly').pack(side=tk.RIGHT)
+        ttk.Label(tile_frame, text="Tile:").pack(side=tk.RIGHT, padx=(0, 5))
+
         # برچسب وضعیت تصویر
         self.image_status = ttk.Label(file_card, text="❌ No image selected", foreground="red")
         self.image_status.pack(anchor=tk.W, pady=(10, 0))
 
+        # کارت ویدیو / دوربین
+        stream_card = ttk.LabelFrame(left_frame, text="📹 Video Stream", padding=15)
+        stream_card.pack(fill=tk.X, pady=(0, 15))
+
+        stream_input_frame = ttk.Frame(stream_card)
+        stream_input_frame.pack(fill=tk.X)
+
+        self.stream_source = tk.StringVar()
+        self.stream_entry = ttk.Entry(stream_input_frame, textvariable=self.stream_source, font=('Arial', 10))
+        self.stream_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, ipady=3)
+
+        self.stream_browse_btn = ttk.Button(stream_input_frame, text="Video", command=self.browse_video)
+        self.stream_browse_btn.pack(side=tk.RIGHT, padx=(10, 0))
+
+        stream_action_frame = ttk.Frame(stream_card)
+        stream_action_frame.pack(fill=tk.X, pady=(8, 0))
+
+        # پخش فایل ویدیو با سرعت واقعی (شبیه‌سازی جریان زنده)
+        self.stream_realtime = tk.BooleanVar(value=True)
+        ttk.Checkbutton(stream_action_frame, text="Live replay", variable=self.stream_realtime).pack(side=tk.LEFT)
+
+        self.stream_btn = ttk.Button(stream_action_frame, text="▶ START", command=self.toggle_stream, width=10)
+        self.stream_btn.pack(side=tk.RIGHT)
+
+        # کارت پایش پوشه (تصاویر جدید به صورت خودکار تحلیل می‌شوند)
+        watch_card = ttk.LabelFrame(left_frame, text="👁 Folder Watch", padding=15)
+        watch_card.pack(fill=tk.X, pady=(0, 15))
+
+        watch_input_frame = ttk.Frame(watch_card)
+        watch_input_frame.pack(fill=tk.X)
+
+        self.watch_folder = tk.StringVar()
+        ttk.Entry(watch_input_frame, textvariable=self.watch_folder,
+                  font=('Arial', 10)).pack(side=tk.LEFT, fill=tk.X, expand=True, ipady=3)
+
+        self.watch_btn = ttk.Button(watch_input_frame, text="▶ WATCH", command=self.toggle_watch, width=10)
+        self.watch_btn.pack(side=tk.RIGHT, padx=(5, 0))
+        ttk.Button(watch_input_frame, text="Folder", command=self.browse_watch_folder).pack(side=tk.RIGHT, padx=(10, 0))
+
+        self.watch_log = tk.Listbox(watch_card, height=4, font=('Arial', 8), activestyle='none')
+        self.watch_log.pack(fill=tk.X, pady=(8, 0))
+
         # دکمه‌های اصلی - در دسترس‌تر
         quick_action_frame = ttk.Frame(left_frame, style='TFrame')
         quick_action_frame.pack(fill=tk.X, pady=(0, 15))
@@ -99,11 +268,49 @@ class ImageViewerGUI:
         model_card = ttk.LabelFrame(left_frame, text="⚙️ System Status", padding=15)
         model_card.pack(fill=tk.X, pady=(0, 15))
 
-        model_status = "✅ Model Loaded" if self.model else "❌ Model Not Available"
-        model_color = "green" if self.model else "red"
-        self.model_status_label = ttk.Label(model_card, text=f"YOLO11: {model_status}", foreground=model_color)
+        self.model_status_label = ttk.Label(model_card, text="YOLO11: ⏳ Loading model...", foreground="orange")
         self.model_status_label.pack(anchor=tk.W)
 
+        self.backend_status_label = ttk.Label(model_card, text="Active: -", foreground='#666666')
+        self.backend_status_label.pack(anchor=tk.W, pady=(2, 0))
+
+        self.cache_status_label = ttk.Label(model_card, text="Cache: -", foreground='#666666')
+        self.cache_status_label.pack(anchor=tk.W, pady=(2, 0))
+
+        # انتخاب نسخه مدل، اندازه ورودی، backend، دقت، تعداد thread و فرایند
+        model_options_frame = ttk.Frame(model_card)
+        model_options_frame.pack(fill=tk.X, pady=(8, 0))
+
+        self.model_tier = tk.StringVar(value="x")
+        ttk.Combobox(model_options_frame, textvariable=self.model_tier, values=MODEL_TIERS,
+                     width=3, state='readonly').pack(side=tk.LEFT)
+
+        self.model_imgsz = tk.StringVar(value=str(DEFAULT_IMGSZ))
+        ttk.Combobox(model_options_frame, textvariable=self.model_imgsz, values=IMAGE_SIZES,
+                     width=5, state='readonly').pack(side=tk.LEFT, padx=(5, 0))
+
+        self.model_backend = tk.StringVar(value=DEFAULT_BACKEND)
+        ttk.Combobox(model_options_frame, textvariable=self.model_backend, values=BACKENDS,
+                     width=11, state='readonly').pack(side=tk.LEFT, padx=(5, 0))
+
+        self.model_precision = tk.StringVar(value=DEFAULT_PRECISION)
+        ttk.Combobox(model_options_frame, textvariable=self.model_precision, values=PRECISIONS,
+                     width=5, state='readonly').pack(side=tk.LEFT, padx=(5, 0))
+
+        self.model_threads = tk.StringVar(value="auto")
+        thread_choices = ["auto"] + [str(n) for n in (1, 2, 4, 8, 16) if n <= (os.cpu_count() or 1)]
+        ttk.Combobox(model_options_frame, textvariable=self.model_threads, values=thread_choices,
+                     width=5, state='readonly').pack(side=tk.LEFT, padx=(5, 0))
+
+        # تعداد فرایندهای پیش‌بینی (1 = داخل همین فرایند)
+        self.model_processes = tk.StringVar(value="1")
+        process_choices = ["1", "auto"] + [str(n) for n in (2, 4, 8) if n <= (os.cpu_count() or 1)]
+        ttk.Combobox(model_options_frame, textvariable=self.model_processes, values=process_choices,
+                     width=5, state='readonly').pack(side=tk.LEFT, padx=(5, 0))
+
+        ttk.Button(model_options_frame, text="Apply", command=self.apply_model_settings,
+                   width=6).pack(side=tk.RIGHT, padx=(5, 0))
+
         # کارت آمار تشخیص
         self.stats_card = ttk.LabelFrame(left_frame, text="📈 Detection Statistics", padding=15)
         self.stats_card.pack(fill=tk.X, pady=(0, 15))
@@ -117,6 +324,10 @@ class ImageViewerGUI:
                                               font=('Arial', 10), foreground='#666666')
         self.detection_time_label.pack(anchor=tk.W, pady=(2, 0))
 
+        # آمار مراحل pipeline ویدیو
+        self.stream_stats_label = ttk.Label(self.stats_card, text="", font=('Arial', 9), foreground='#666666')
+        self.stream_stats_label.pack(anchor=tk.W, pady=(2, 0))
+
         # کارت نتایج پیش‌بینی
         self.results_card = ttk.LabelFrame(left_frame, text="📊 Analysis Results", padding=15)
         self.results_card.pack(fill=tk.BOTH, expand=True)
@@ -155,10 +366,8 @@ class ImageViewerGUI:
 
         scrollbar.config(command=self.ranking_canvas.yview)
 
-        # فریم داخلی برای آیتم‌های رتبه‌بندی
-        self.ranking_inner_frame = ttk.Frame(self.ranking_canvas)
-        self.ranking_canvas_window = self.ranking_canvas.create_window((0, 0), window=self.ranking_inner_frame,
-                                                                       anchor="nw")
+        # سطرهای رتبه‌بندی مستقیما روی canvas رسم و فقط در صورت تغییر به‌روز می‌شوند
+        self.ranking_view = RankingView(self.ranking_canvas, max_rows=10)
 
         # کارت نمایش تصویر
         image_card = ttk.LabelFrame(self.right_frame, text="🖼️ Image Preview", padding=15)
@@ -170,6 +379,61 @@ class ImageViewerGUI:
                                      font=('Arial', 11), foreground='#666666')
         self.image_label.pack(fill=tk.BOTH, expand=True)
 
+        # پنل کارایی (قابل باز و بسته شدن)
+        perf_header = ttk.Frame(self.right_frame)
+        perf_header.pack(fill=tk.X, pady=(10, 0))
+
+        self.perf_toggle_btn = ttk.Button(perf_header, text="📊 Performance ▸", command=self.toggle_performance_panel)
+        self.perf_toggle_btn.pack(side=tk.LEFT)
+
+        self.query_toggle_btn = ttk.Button(perf_header, text="🔎 Query ▸", command=self.toggle_query_panel)
+        self.query_toggle_btn.pack(side=tk.LEFT, padx=(5, 0))
+
+        # پنل جستجو در نتایج ذخیره‌شده (مثلا person>=3@0.6, dog)
+        self.query_panel = ttk.Frame(self.right_frame)
+        self.query_panel_visible = False
+
+        query_input_frame = ttk.Frame(self.query_panel)
+        query_input_frame.pack(fill=tk.X, pady=(5, 0))
+
+        self.query_text = tk.StringVar(value="person>=3@0.6")
+        query_entry = ttk.Entry(query_input_frame, textvariable=self.query_text, font=('Arial', 10))
+        query_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, ipady=2)
+        query_entry.bind('<Return>', lambda event: self.run_query())
+        ttk.Button(query_input_frame, text="Search", command=self.run_query).pack(side=tk.RIGHT, padx=(5, 0))
+
+        self.query_status_label = ttk.Label(self.query_panel, text="", font=('Arial', 9), foreground='#666666')
+        self.query_status_label.pack(anchor=tk.W, pady=(2, 0))
+
+        query_list_frame = ttk.Frame(self.query_panel)
+        query_list_frame.pack(fill=tk.X, pady=(2, 0))
+        query_scrollbar = ttk.Scrollbar(query_list_frame)
+        query_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.query_results = tk.Listbox(query_list_frame, height=6, font=('Arial', 9),
+                                        yscrollcommand=query_scrollbar.set, activestyle='none')
+        self.query_results.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.query_results.bind('<Double-Button-1>', self.open_query_result)
+        query_scrollbar.config(command=self.query_results.yview)
+        self.query_paths = []
+
+        self.perf_panel = ttk.Frame(self.right_frame)
+        self.perf_panel_visible = False
+
+        self.perf_summary_label = ttk.Label(self.perf_panel, text="", font=('Arial', 9), foreground='#666666')
+        self.perf_summary_label.pack(anchor=tk.W, pady=(5, 0))
+
+        self.perf_canvas = tk.Canvas(self.perf_panel, height=150, bg='white', highlightthickness=1,
+                                     highlightbackground='#cccccc')
+        self.perf_canvas.pack(fill=tk.X, pady=(5, 0))
+
+        perf_actions = ttk.Frame(self.perf_panel)
+        perf_actions.pack(fill=tk.X, pady=(5, 0))
+        ttk.Button(perf_actions, text="Export trace", command=self.export_trace).pack(side=tk.LEFT)
+        ttk.Button(perf_actions, text="cProfile next",
+                   command=lambda: self.profile_next_request(CAPTURE_CPROFILE)).pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Button(perf_actions, text="Torch profile next",
+                   command=lambda: self.profile_next_request(CAPTURE_TORCH)).pack(side=tk.LEFT, padx=(5, 0))
+
         # متغیر برای ذخیره تصویر
         self.current_image = None
         self.image_tk = None
@@ -177,21 +441,18 @@ class ImageViewerGUI:
         self.annotated_image = None
 
         # تنظیم event binding برای تغییر سایز
-        self.ranking_inner_frame.bind("<Configure>", self.on_frame_configure)
         self.ranking_canvas.bind("<Configure>", self.on_canvas_configure)
 
         # اضافه کردن کلیدهای میانبر
         self.root.bind('<Return>', lambda event: self.analyze_image())
         self.root.bind('<Control-o>', lambda event: self.browse_image())
         self.root.bind('<Control-l>', lambda event: self.clear_form())
-
-    def on_frame_configure(self, event):
-        """به روز رسانی scrollregion هنگام تغییر سایز فریم"""
-        self.ranking_canvas.configure(scrollregion=self.ranking_canvas.bbox("all"))
+        self.root.bind('<Prior>', lambda event: self.show_neighbour(-1))
+        self.root.bind('<Next>', lambda event: self.show_neighbour(1))
 
     def on_canvas_configure(self, event):
-        """به روز رسانی عرض فریم داخلی هنگام تغییر سایز کانواس"""
-        self.ranking_canvas.itemconfig(self.ranking_canvas_window, width=event.width)
+        """به روز رسانی عرض سطرهای رتبه‌بندی هنگام تغییر سایز کانواس"""
+        self.ranking_view.resize(event.width)
 
     def browse_image(self):
         """باز کردن دیالوگ برای انتخاب تصویر"""
@@ -201,91 +462,353 @@ class ImageViewerGUI:
         )
 
         if file_path:
-            self.file_path.set(file_path)
-            self.image_path = file_path
-            self.load_and_display_image(file_path)
+            self.open_image(file_path)
+
+    def open_image(self, file_path):
+        """انتخاب یک تصویر به عنوان تصویر فعلی"""
+        self.cancel_inference()
+        self.file_path.set(file_path)
+        self.image_path = file_path
+        self.load_and_display_image(file_path)
+
+    def show_neighbour(self, offset):
+        """نمایش تصویر قبلی (-1) یا بعدی (+1) در پوشه تصویر فعلی"""
+        if self.image_path is None or self.stream is not None or self.watch is not None:
+            return
+        files = folder_images(self.image_path)
+        try:
+            position = files.index(os.path.abspath(self.image_path)) + offset
+        except ValueError:
+            return
+        if 0 <= position < len(files):
+            self.open_image(files[position])
 
     def load_and_display_image(self, file_path):
         """لود و نمایش تصویر"""
         try:
-            # لود تصویر
-            self.current_image = Image.open(file_path)
-
-            # تغییر سایز برای نمایش
-            display_image = self.resize_image(self.current_image, 500)
-            self.image_tk = ImageTk.PhotoImage(display_image)
-
-            # نمایش تصویر
-            self.image_label.configure(image=self.image_tk, text="")
+            # ابتدا پیش‌نمایش سریع (از cache یا decode کوچک‌شده JPEG) نمایش داده می‌شود؛
+            # decode کامل تصویر تا زمان پیش‌بینی به تعویق می‌افتد
+            self.current_image = None
+            self.annotated_image = None
+            preview, _, quality = self.previews.get(file_path)
+            self.current_image = DecodedImage.deferred(file_path)
+            self.current_image.set_preview(PREVIEW_SIZE, preview)
+            self.show_preview(preview)
             self.image_status.configure(text="✅ Image loaded successfully", foreground="green")
 
+            # بهبود کیفیت پیش‌نمایش و آماده کردن تصاویر قبلی و بعدی در پس‌زمینه
+            if quality != QUALITY_REFINED:
+                self.previews.refine(file_path)
+            self.previews.prefetch(neighbours(file_path))
+
         except Exception as e:
             self.image_status.configure(text=f"❌ Error: {str(e)}", foreground="red")
 
-    def resize_image(self, image, max_size):
-        """تغییر سایز تصویر برای نمایش"""
-        width, height = image.size
+    def show_preview(self, preview):
+        with profiler.stage("display"):
+            self.image_tk = ImageTk.PhotoImage(preview)
+            self.image_label.configure(image=self.image_tk, text="")
+
+    def apply_refined_previews(self):
+        """جایگزینی پیش‌نمایش سریع با نسخه باکیفیت، اگر هنوز همان تصویر بدون کادر نمایش داده می‌شود"""
+        for path, (preview, _, _) in self.previews.poll():
+            if self.current_image is None or path != self.current_image.path:
+                continue
+            self.current_image.set_preview(PREVIEW_SIZE, preview)
+            if self.annotated_image is None and self.stream is None:
+                self.show_preview(preview)
+
+    def browse_video(self):
+        """انتخاب فایل ویدیو (برای دوربین شماره آن مثلا 0 و برای RTSP آدرس آن را وارد کنید)"""
+        file_path = filedialog.askopenfilename(
+            title="Select Video",
+            filetypes=[("Video files", " ".join(VIDEO_EXTENSIONS))]
+        )
+
+        if file_path:
+            self.stream_source.set(file_path)
+
+    def toggle_stream(self):
+        """شروع یا توقف پردازش ویدیو"""
+        if self.stream is not None:
+            self.stop_stream()
+        else:
+            self.start_stream()
+
+    def start_stream(self):
+        """شروع pipeline ویدیو با همان موتور تشخیص و رسم کادرها"""
+        source = self.stream_source.get().strip()
+        if not source:
+            self.image_status.configure(text="❌ Please select a video or camera", foreground="red")
+            return
+
+        if not self.worker.ready:
+            self.image_status.configure(text="❌ YOLO model not ready", foreground="red")
+            return
+
+        if self.watch is not None:
+            return
+
+        self.cancel_inference()
+        self.stream = StreamPipeline(source, self.worker.engine, self.renderer,
+                                     realtime=self.stream_realtime.get())
+        self.stream.start()
+
+        self.stream_btn.config(text="⏹ STOP")
+        self.predict_btn.config(state='disabled')
+        self.image_status.configure(text="📹 Streaming...", foreground="orange")
+        self.root.after(STREAM_POLL_INTERVAL_MS, self.poll_stream)
+
+    def stop_stream(self):
+        """توقف pipeline ویدیو"""
+        if self.stream is None:
+            return
+
+        self.stream.stop()
+        error = self.stream.error
+        self.stream = None
+
+        self.stream_btn.config(text="▶ START")
+        self.predict_btn.config(state='normal')
+        if error is not None:
+            self.image_status.configure(text=f"❌ Stream error: {str(error)}", foreground="red")
+        else:
+            self.image_status.configure(text="⏹ Stream stopped", foreground="green")
+
+    def poll_stream(self):
+        """نمایش تازه‌ترین فریم آماده روی thread اصلی Tk"""
+        if self.stream is None:
+            return
+
+        item = self.stream.next_frame()
+        if item is not None:
+            self.annotated_image = ImageTk.PhotoImage(item.display_image)
+            self.image_label.configure(image=self.annotated_image, text="")
+            self.process_yolo_results(item.detections, item.inference_time)
+            self.stream_stats_label.configure(text=self.stream.stats_text())
 
-        if width > height:
-            new_width = max_size
-            new_height = int(height * (max_size / width))
+        if self.stream.running:
+            self.root.after(STREAM_POLL_INTERVAL_MS, self.poll_stream)
         else:
-            new_height = max_size
-            new_width = int(width * (max_size / height))
+            self.stop_stream()
+
+    def browse_watch_folder(self):
+        """انتخاب پوشه‌ای که تصاویر جدید آن پایش می‌شوند"""
+        directory = filedialog.askdirectory(title="Select Folder to Watch")
+        if directory:
+            self.watch_folder.set(directory)
+
+    def toggle_watch(self):
+        """شروع یا توقف پایش پوشه"""
+        if self.watch is not None:
+            self.stop_watch()
+        else:
+            self.start_watch()
 
-        return image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    def start_watch(self):
+        """شروع پردازش خودکار تصاویر جدید یا تغییرکرده پوشه انتخاب‌شده"""
+        directory = self.watch_folder.get().strip()
+        if not directory:
+            self.image_status.configure(text="❌ Please select a folder to watch", foreground="red")
+            return
 
-    def draw_bounding_boxes(self, image, results):
-        """رسم bounding box و برچسب‌ها روی تصویر"""
-        draw = ImageDraw.Draw(image)
+        if not self.worker.ready:
+            self.image_status.configure(text="❌ YOLO model not ready", foreground="red")
+            return
+
+        if self.stream is not None:
+            return
 
-        # فونت برای نوشتن متن
+        self.cancel_inference()
         try:
-            font = ImageFont.truetype("arial.ttf", 20)
-        except:
-            font = ImageFont.load_default()
+            self.watch = WatchPipeline(directory, self.worker.engine, Manifest(), store=self.store,
+                                       renderer=self.renderer)
+            self.watch.start()
+        except Exception as e:
+            self.watch = None
+            self.image_status.configure(text=f"❌ Watch error: {str(e)}", foreground="red")
+            return
+
+        self.watch_btn.config(text="⏹ STOP")
+        self.predict_btn.config(state='disabled')
+        self.image_status.configure(text=f"👁 Watching {os.path.basename(directory)}...", foreground="orange")
+        self.root.after(WATCH_POLL_INTERVAL_MS, self.poll_watch)
+
+    def stop_watch(self, then=None):
+        """توقف پایش پوشه بدون بلاک کردن پنجره؛ then پس از توقف کامل روی thread رابط گرافیکی اجرا می‌شود"""
+        if self.watch is None:
+            if then is not None:
+                then()
+            return
+        if then is not None and then not in self.watch_stop_callbacks:
+            self.watch_stop_callbacks.append(then)
+        if self.watch_stopper is not None:
+            return
+
+        # stop() تا پایان دسته در حال پردازش صبر می‌کند؛ روی thread جدا تا پنجره قفل نشود
+        self.watch_stopper = threading.Thread(target=self.watch.stop, name="watch-stop", daemon=True)
+        self.watch_stopper.start()
+        self.watch_btn.config(text="⏳ STOPPING", state='disabled')
+        self.image_status.configure(text="⏳ Stopping watch...", foreground="orange")
+        self.root.after(WATCH_POLL_INTERVAL_MS, self.finish_stop_watch)
+
+    def finish_stop_watch(self):
+        """پس از پایان thread‌های watch: دریافت آخرین نتایج و بستن manifest"""
+        if self.watch_stopper.is_alive():
+            self.root.after(WATCH_POLL_INTERVAL_MS, self.finish_stop_watch)
+            return
+
+        for result in self.watch.poll():
+            self.watch_log.insert(tk.END, format_log_line(result))
+        self.watch_log.see(tk.END)
+        self.watch.manifest.close()
+        self.watch = None
+        self.watch_stopper = None
+
+        self.watch_btn.config(text="▶ WATCH", state='normal')
+        self.predict_btn.config(state='normal')
+        self.image_status.configure(text="⏹ Watch stopped", foreground="green")
 
-        if results and len(results) > 0:
-            result = results[0]
+        callbacks, self.watch_stop_callbacks = self.watch_stop_callbacks, []
+        for callback in callbacks:
+            callback()
 
-            if result.boxes and len(result.boxes) > 0:
-                boxes = result.boxes
+    def poll_watch(self):
+        """افزودن نتایج جدید به گزارش و نمایش آخرین تصویر تحلیل‌شده"""
+        if self.watch is None or self.watch_stopper is not None:
+            return
 
-                for box in boxes:
-                    # مختصات bounding box
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    confidence = box.conf.item()
-                    class_id = int(box.cls.item())
-                    class_name = self.model.names[class_id]
+        latest = None
+        for result in self.watch.poll():
+            self.watch_log.insert(tk.END, format_log_line(result))
+            if result.error is None:
+                latest = result
+        if self.watch_log.size() > WATCH_LOG_LINES:
+            self.watch_log.delete(0, self.watch_log.size() - WATCH_LOG_LINES - 1)
+        self.watch_log.see(tk.END)
+
+        if latest is not None:
+            if latest.display_image is not None:
+                self.annotated_image = ImageTk.PhotoImage(latest.display_image)
+                self.image_label.configure(image=self.annotated_image, text="")
+            self.process_yolo_results(latest.detections, latest.elapsed)
+        self.stream_stats_label.configure(text=self.watch.stats_text())
+
+        self.root.after(WATCH_POLL_INTERVAL_MS, self.poll_watch)
+
+    def toggle_performance_panel(self):
+        """باز و بسته کردن پنل کارایی"""
+        self.perf_panel_visible = not self.perf_panel_visible
+        if self.perf_panel_visible:
+            self.perf_panel.pack(fill=tk.X)
+            self.perf_toggle_btn.config(text="📊 Performance ▾")
+            self.update_performance_panel()
+        else:
+            self.perf_panel.pack_forget()
+            self.perf_toggle_btn.config(text="📊 Performance ▸")
+
+    def toggle_query_panel(self):
+        """باز و بسته کردن پنل جستجو"""
+        self.query_panel_visible = not self.query_panel_visible
+        if self.query_panel_visible:
+            self.query_panel.pack(fill=tk.X)
+            self.query_toggle_btn.config(text="🔎 Query ▾")
+            self.query_status_label.configure(text=self.store.stats_text())
+        else:
+            self.query_panel.pack_forget()
+            self.query_toggle_btn.config(text="🔎 Query ▸")
 
-                    # رنگ بر اساس کلاس
-                    color = self.get_color_for_class(class_id)
+    def run_query(self):
+        """جستجو در store و نمایش تصاویر مطابق؛ دوبار کلیک روی هر مورد تصویر را باز می‌کند"""
+        try:
+            result = self.store.query(self.query_text.get())
+        except ValueError as e:
+            self.query_status_label.configure(text=f"❌ {e}", foreground="red")
+            return
 
-                    # رسم مستطیل
-                    draw.rectangle([x1, y1, x2, y2], outline=color, width=3)
+        self.query_paths = result.paths
+        self.query_results.delete(0, tk.END)
+        for path, counts in zip(result.paths, result.counts):
+            label = " / ".join(str(int(c)) for c in counts)
+            self.query_results.insert(tk.END, f"{os.path.basename(path)}  ({label})")
+        self.query_status_label.configure(
+            text=f"{len(result)} images in {result.elapsed * 1000:.1f} ms · {self.store.stats_text()}",
+            foreground='#666666')
+
+    def open_query_result(self, event):
+        selection = self.query_results.curselection()
+        if selection and self.stream is None and self.watch is None:
+            path = self.query_paths[selection[0]]
+            if os.path.exists(path):
+                self.open_image(path)
+
+    def update_performance_panel(self):
+        """به‌روزرسانی دوره‌ای هیستوگرام تاخیر مراحل، حافظه و توان عملیاتی"""
+        if not self.perf_panel_visible:
+            return
+
+        memory = memory_mb()
+        memory_text = f"{memory:.0f} MB" if memory is not None else "-"
+        images = profiler.counters.get("images", 0)
+        throughput = profiler.throughput("predict")
+        self.perf_summary_label.configure(
+            text=f"Memory: {memory_text} | Images: {images} | Throughput: {throughput:.2f} predict/s")
 
-                    # متن برچسب
-                    label = f"{class_name} {confidence:.2f}"
+        self.draw_latency_histograms()
+        self.root.after(PERF_PANEL_INTERVAL_MS, self.update_performance_panel)
 
-                    # اندازه متن
-                    bbox = draw.textbbox((0, 0), label, font=font)
-                    text_width = bbox[2] - bbox[0]
-                    text_height = bbox[3] - bbox[1]
+    def draw_latency_histograms(self):
+        """رسم هیستوگرام تاخیر نمونه‌های اخیر هر مرحله روی canvas"""
+        canvas = self.perf_canvas
+        canvas.delete("all")
 
-                    # پس‌زمینه برای متن
-                    draw.rectangle([x1, y1 - text_height - 5, x1 + text_width + 10, y1],
-                                   fill=color)
+        stages = profiler.stage_names()
+        if not stages:
+            canvas.create_text(10, 10, text="No samples yet", anchor=tk.NW, fill='#666666', font=('Arial', 9))
+            return
 
-                    # نوشتن متن
-                    draw.text((x1 + 5, y1 - text_height - 2), label, fill='white', font=font)
+        width = max(canvas.winfo_width(), 300)
+        row_height = max(150 // len(stages), 18)
+        canvas.configure(height=row_height * len(stages))
+        bins = 24
+        hist_left, hist_right = 90, width - 150
+
+        for row, name in enumerate(stages):
+            values = profiler.durations(name)
+            top = row * row_height
+            bottom = top + row_height - 3
+
+            counts, _ = np.histogram(values, bins=bins, range=(0, max(values.max(), 1e-3)))
+            bar_width = (hist_right - hist_left) / bins
+            peak = max(counts.max(), 1)
+            for i, count in enumerate(counts):
+                if count:
+                    x = hist_left + i * bar_width
+                    height = (bottom - top - 2) * count / peak
+                    canvas.create_rectangle(x, bottom - height, x + bar_width - 1, bottom,
+                                            fill='#007acc', outline='')
+
+            p50, p95 = np.percentile(values, [50, 95])
+            canvas.create_text(5, (top + bottom) / 2, text=name, anchor=tk.W, font=('Arial', 9))
+            canvas.create_text(hist_right + 8, (top + bottom) / 2, anchor=tk.W, font=('Arial', 9),
+                               text=f"p50 {p50:.1f} / p95 {p95:.1f} ms")
+
+    def export_trace(self):
+        """ذخیره نمونه‌های اخیر در فایل Chrome trace"""
+        file_path = filedialog.asksaveasfilename(
+            title="Export Trace",
+            defaultextension=".json",
+            filetypes=[("Chrome trace", "*.json")]
+        )
 
-        return image
+        if file_path:
+            profiler.export_chrome_trace(file_path)
+            self.image_status.configure(text=f"✅ Trace saved: {os.path.basename(file_path)}", foreground="green")
 
-    def get_color_for_class(self, class_id):
-        """تولید رنگ بر اساس کلاس"""
-        colors = ['#FF0000', '#00FF00', '#0000FF', '#FFFF00', '#FF00FF',
-                  '#00FFFF', '#FFA500', '#800080', '#008000', '#800000']
-        return colors[class_id % len(colors)]
+    def profile_next_request(self, kind):
+        """فعال کردن profiler برای پیش‌بینی بعدی"""
+        profiler.capture_next(kind)
+        self.image_status.configure(text=f"🔬 {kind} will capture the next prediction", foreground="orange")
 
     def analyze_image(self):
         """آنالیز تصویر با استفاده از YOLO"""
@@ -293,99 +816,121 @@ class ImageViewerGUI:
             self.image_status.configure(text="❌ Please select an image first", foreground="red")
             return
 
-        if self.model is None:
+        if self.worker.status == STATUS_ERROR:
             self.image_status.configure(text="❌ YOLO model not available", foreground="red")
             return
 
+        if self.pending_request is not None or self.stream is not None or self.watch is not None:
+            return
+
+        self.image_status.configure(text="⏳ Analyzing image with YOLO...", foreground="orange")
+        self.predict_btn.config(state='disabled', text="⏳ PROCESSING...")
+
+        # پیش‌بینی در thread پس‌زمینه انجام می‌شود و نتیجه در poll_inference اعمال می‌شود
+        if self.tiled_inference.get():
+            self.pending_request = self.worker.submit(self.current_image, tile=int(self.tile_size.get()))
+        else:
+            self.pending_request = self.worker.submit(self.current_image)
+
+    def poll_inference(self):
+        """بررسی دوره‌ای نتایج پیش‌بینی و اعمال آن‌ها روی thread اصلی Tk"""
+        if self.worker is not None:
+            self.update_model_status()
+            for result in self.worker.poll():
+                if result.request_id == self.pending_request:
+                    self.apply_inference_result(result)
+        self.apply_refined_previews()
+
+        self.root.after(POLL_INTERVAL_MS, self.poll_inference)
+
+    def apply_inference_result(self, result):
+        """نمایش نتیجه پیش‌بینی دریافت‌شده از thread پس‌زمینه"""
+        self.pending_request = None
         try:
-            self.image_status.configure(text="⏳ Analyzing image with YOLO...", foreground="orange")
-            self.predict_btn.config(state='disabled', text="⏳ PROCESSING...")
-            self.root.update()
-
-            # انجام پیش‌بینی با YOLO
-            import time
-            start_time = time.time()
-            results = self.model.predict(source=self.image_path, save=False, verbose=False,conf = 0.2)
-            #####😅😅😅😅😅😅😅😅😅😅😅😅😅😅😅😅😅😅
-            end_time = time.time()
-            detection_time = end_time - start_time
+            if result.error is not None:
+                raise result.error
 
             # پردازش نتایج
-            self.process_yolo_results(results, detection_time)
+            with profiler.stage("results"):
+                self.process_yolo_results(result.detections, result.elapsed)
 
             # نمایش تصویر با bounding box
-            self.display_annotated_image(results)
+            self.display_annotated_image(result.detections, result.image)
+
+            if result.image.path is not None:
+                self.store.add(os.path.abspath(result.image.path), result.detections)
 
             self.image_status.configure(text="✅ Analysis complete", foreground="green")
-            self.predict_btn.config(state='normal', text="🚀 PREDICT IMAGE")
+            if profiler.last_capture:
+                self.image_status.configure(text=f"✅ Analysis complete, profile: {profiler.last_capture}")
+                profiler.last_capture = None
+            self.cache_status_label.configure(text=self.worker.engine.cache.stats_text())
 
         except Exception as e:
             self.image_status.configure(text=f"❌ Analysis error: {str(e)}", foreground="red")
-            self.predict_btn.config(state='normal', text="🚀 PREDICT IMAGE")
 
-    def display_annotated_image(self, results):
-        """نمایش تصویر با bounding box"""
-        if results and len(results) > 0:
-            # لود مجدد تصویر اصلی
-            original_image = Image.open(self.image_path)
+        self.predict_btn.config(state='normal', text="🚀 PREDICT IMAGE")
 
-            # رسم bounding box روی تصویر
-            annotated_image = self.draw_bounding_boxes(original_image.copy(), results)
+    def cancel_inference(self):
+        """لغو پیش‌بینی در حال اجرا؛ نتیجه آن پس از رسیدن نادیده گرفته می‌شود"""
+        if self.worker is not None:
+            self.worker.cancel()
+        if self.pending_request is not None:
+            self.pending_request = None
+            self.predict_btn.config(state='normal', text="🚀 PREDICT IMAGE")
 
-            # تغییر سایز برای نمایش
-            display_image = self.resize_image(annotated_image, 500)
-            self.annotated_image = ImageTk.PhotoImage(display_image)
+    def on_close(self):
+        """بستن پنجره و متوقف کردن thread پیش‌بینی"""
+        if self.stream is not None:
+            self.stream.stop()
+        # store فقط پس از پایان دسته در حال پردازش watch ذخیره و پنجره بسته می‌شود
+        self.stop_watch(then=self.close)
+
+    def close(self):
+        """بستن worker، پیش‌خوان تصاویر و ذخیره store پس از توقف کامل watch"""
+        if self.worker is not None:
+            self.worker.stop()
+        self.previews.close()
+        try:
+            self.store.save()
+        except Exception as e:
+            print(f"خطا در ذخیره store نتایج: {e}")
+        self.root.destroy()
+
+    def display_annotated_image(self, detections, decoded_image):
+        """نمایش تصویر با bounding box"""
+        if detections is not None:
+            # رسم bounding box روی پیش‌نمایش کوچک‌شده (نه روی تصویر با رزولوشن کامل)
+            with profiler.stage("annotate"):
+                display_image = self.renderer.render(decoded_image, detections, PREVIEW_SIZE)
 
             # نمایش تصویر
-            self.image_label.configure(image=self.annotated_image, text="")
+            with profiler.stage("display"):
+                self.annotated_image = ImageTk.PhotoImage(display_image)
+                self.image_label.configure(image=self.annotated_image, text="")
 
-    def process_yolo_results(self, results, detection_time):
+    def process_yolo_results(self, detections, detection_time):
         """پردازش نتایج YOLO و نمایش رتبه‌بندی کلاس‌ها"""
         # پاک کردن رتبه‌بندی قبلی
         self.clear_ranking_display()
 
-        if results and len(results) > 0:
-            result = results[0]
-
-            # جمع‌آوری تمام detection‌ها
-            class_predictions = {}
-            class_counts = {}
-
-            if result.boxes and len(result.boxes) > 0:
-                boxes = result.boxes
-                total_objects = len(boxes)
+        if detections is not None:
+            # تعداد و بالاترین confidence هر کلاس، مرتب‌شده بر اساس confidence (نزولی)
+            ranking = detections.ranking()
 
+            # اگر detection پیدا شد
+            if ranking:
                 # آمار کلی
-                self.total_objects_label.configure(text=f"Total Objects: {total_objects}")
+                self.total_objects_label.configure(text=f"Total Objects: {len(detections)}")
                 self.detection_time_label.configure(text=f"Detection Time: {detection_time:.2f}s")
 
-                for box in boxes:
-                    confidence = box.conf.item()
-                    class_id = int(box.cls.item())
-                    class_name = self.model.names[class_id]
-
-                    # شمارش تعداد هر کلاس
-                    if class_name not in class_counts:
-                        class_counts[class_name] = 0
-                    class_counts[class_name] += 1
-
-                    # استفاده از بالاترین confidence برای هر کلاس
-                    if class_name not in class_predictions or confidence > class_predictions[class_name]:
-                        class_predictions[class_name] = confidence
-
-            # اگر detection پیدا شد
-            if class_predictions:
-                # مرتب‌سازی کلاس‌ها بر اساس confidence (نزولی)
-                sorted_predictions = sorted(class_predictions.items(), key=lambda x: x[1], reverse=True)
-
                 # نمایش بهترین پیش‌بینی
-                best_class, best_confidence = sorted_predictions[0]
-                count = class_counts.get(best_class, 1)
+                best_class, best_confidence, count = ranking[0]
                 self.prediction_label.configure(text=f"Top Detection: {best_class} (x{count})")
                 self.confidence_label.configure(text=f"Confidence: {best_confidence:.3f}")
 
                 # نمایش رتبه‌بندی کامل
-                self.display_class_rankings(sorted_predictions, class_counts)
+                self.display_class_rankings(ranking)
 
             else:
                 # اگر هیچ کلاسی تشخیص داده نشد
@@ -398,65 +943,19 @@ class ImageViewerGUI:
             self.confidence_label.configure(text="Confidence: -")
             self.total_objects_label.configure(text="Total Objects: 0")
 
-    def display_class_rankings(self, sorted_predictions, class_counts):
-        """نمایش رتبه‌بندی کلاس‌ها"""
-        # نمایش 10 کلاس برتر
-        max_display = min(10, len(sorted_predictions))
-
-        for i, (class_name, confidence) in enumerate(sorted_predictions[:max_display]):
-            count = class_counts.get(class_name, 1)
-
-            # ایجاد کارت برای هر آیتم
-            item_frame = ttk.Frame(self.ranking_inner_frame, relief='solid', borderwidth=1)
-            item_frame.pack(fill=tk.X, pady=2, padx=2)
-
-            # رنگ‌بندی بر اساس رتبه
-            if i == 0:
-                bg_color = '#e8f5e8'  # سبز برای رتبه اول
-            elif i == 1:
-                bg_color = '#e8f0ff'  # آبی برای رتبه دوم
-            elif i == 2:
-                bg_color = '#fff8e8'  # زرد برای رتبه سوم
-            else:
-                bg_color = '#f8f8f8'  # خاکستری روشن برای بقیه
-
-            # محتوای کارت
-            content_frame = ttk.Frame(item_frame, style='TFrame')
-            content_frame.pack(fill=tk.X, padx=8, pady=6)
-
-            # شماره رتبه
-            rank_label = ttk.Label(content_frame, text=f"{i + 1}", font=('Arial', 12, 'bold'),
-                                   width=3, background=bg_color)
-            rank_label.pack(side=tk.LEFT)
-
-            # نام کلاس و تعداد
-            class_text = f"{class_name} (x{count})"
-            class_label = ttk.Label(content_frame, text=class_text, font=('Arial', 10),
-                                    background=bg_color, width=18, anchor=tk.W)
-            class_label.pack(side=tk.LEFT, padx=(8, 0))
-
-            # مقدار confidence
-            confidence_label = ttk.Label(content_frame, text=f"{confidence:.3f}",
-                                         font=('Arial', 10, 'bold'), foreground='#007acc',
-                                         background=bg_color, width=8)
-            confidence_label.pack(side=tk.RIGHT)
-
-            # نوار پیشرفت
-            progress = ttk.Progressbar(content_frame, length=80, value=confidence * 100,
-                                       maximum=100, style='TProgressbar')
-            progress.pack(side=tk.RIGHT, padx=(5, 10))
-
-            # تنظیم رنگ پس‌زمینه برای تمام ویجت‌ها
-            for widget in [rank_label, class_label, confidence_label]:
-                widget.configure(background=bg_color)
+    def display_class_rankings(self, ranking):
+        """نمایش رتبه‌بندی کلاس‌ها (10 کلاس برتر)"""
+        self.ranking_view.update(ranking)
 
     def clear_ranking_display(self):
         """پاک کردن نمایش رتبه‌بندی"""
-        for widget in self.ranking_inner_frame.winfo_children():
-            widget.destroy()
+        self.ranking_view.clear()
 
     def clear_form(self):
         """پاک کردن فرم"""
+        self.stop_stream()
+        self.stop_watch()
+        self.cancel_inference()
         self.file_path.set("")
         self.current_image = None
         self.image_tk = None
@@ -472,13 +971,62 @@ class ImageViewerGUI:
         self.confidence_label.configure(text="Confidence: -")
         self.total_objects_label.configure(text="Total Objects: 0")
         self.detection_time_label.configure(text="Detection Time: -")
+        self.stream_stats_label.configure(text="")
+
+
+def build_parser():
+    """ساخت parser خط فرمان؛ بدون زیر‌فرمان رابط گرافیکی اجرا می‌شود"""
+    parser = argparse.ArgumentParser(description="AI Image Analyzer - YOLO11")
+    subparsers = parser.add_subparsers(dest="command")
+
+    import batch
+    batch_parser = subparsers.add_parser("batch", help="headless detection over folders / file lists")
+    batch.add_arguments(batch_parser)
+    batch_parser.set_defaults(handler=batch.run)
+
+    import benchmark
+    benchmark_parser = subparsers.add_parser("benchmark", help="per-stage latency / throughput benchmark")
+    benchmark.add_arguments(benchmark_parser)
+    benchmark_parser.set_defaults(handler=benchmark.run)
+
+    import server
+    server_parser = subparsers.add_parser("serve", help="local HTTP detection service with micro-batching")
+    server.add_arguments(server_parser)
+    server_parser.set_defaults(handler=server.run)
+
+    import loadtest
+    loadtest_parser = subparsers.add_parser("loadtest", help="load test a running detection service")
+    loadtest.add_arguments(loadtest_parser)
+    loadtest_parser.set_defaults(handler=loadtest.run)
+
+    import store
+    query_parser = subparsers.add_parser("query", help="search stored detections without re-running the model")
+    store.add_arguments(query_parser)
+    query_parser.set_defaults(handler=store.run)
+
+    import watch
+    watch_parser = subparsers.add_parser("watch", help="watch a folder and detect new images continuously")
+    watch.add_arguments(watch_parser)
+    watch_parser.set_defaults(handler=watch.run)
+
+    import evaluate
+    evaluate_parser = subparsers.add_parser("evaluate", help="compare reduced-precision modes against fp32")
+    evaluate.add_arguments(evaluate_parser)
+    evaluate_parser.set_defaults(handler=evaluate.run)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
 
+    if args.command is not None:
+        return args.handler(args)
 
-def main():
     root = tk.Tk()
     app = ImageViewerGUI(root)
     root.mainloop()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,239 @@
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from detections import Detections
+
+# تعداد thread هر فرایند در حالت خودکار؛ تعداد فرایندها = هسته‌ها / این مقدار
+THREADS_PER_WORKER = 2
+
+# فاصله بررسی زنده بودن فرایندها هنگام انتظار برای نتیجه (ثانیه)
+POLL_TIMEOUT = 1.0
+START_TIMEOUT = 600.0
+
+_READY = "ready"
+
+
+def available_cores():
+    """هسته‌هایی که این فرایند اجازه استفاده از آن‌ها را دارد"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def auto_workers(threads_per_worker=THREADS_PER_WORKER):
+    """تعداد فرایند مناسب برای تعداد هسته‌های در دسترس"""
+    return max(1, len(available_cores()) // threads_per_worker)
+
+
+class SharedFrame:
+    """تصویری که پیکسل‌هایش مستقیما روی حافظه مشترک است (همان رابط DecodedImage)"""
+
+    def __init__(self, pixels):
+        self.path = None
+        self.pixels = pixels
+
+
+def _close_segment(segment):
+    try:
+        segment.close()
+    except BufferError:
+        # هنوز آرایه‌ای به این حافظه اشاره می‌کند؛ با جمع‌آوری زباله آزاد می‌شود
+        pass
+
+
+def _worker_main(index, settings, threads, cores, tasks, results):
+    """حلقه اصلی هر فرایند: یک مدل مستقل که تصاویر را از حافظه مشترک می‌خواند"""
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+    from engine import DetectionEngine
+
+    engine = DetectionEngine(threads=threads, interop_threads=1, **settings)
+    try:
+        engine.load()
+    except Exception as e:
+        results.put((_READY, index, f"{type(e).__name__}: {e}"))
+        return
+    results.put((_READY, index, dict(engine.names)))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+
+        seq, frames = task
+        segments = [shared_memory.SharedMemory(name=name) for name, _ in frames]
+        try:
+            # آرایه‌ها فقط view روی حافظه مشترک هستند و کپی نمی‌شوند
+            images = [SharedFrame(np.ndarray(shape, dtype=np.uint8, buffer=segment.buf))
+                      for segment, (_, shape) in zip(segments, frames)]
+            detections = engine.detect(images)
+            payload, error = [(item.xyxy, item.conf, item.cls) for item in detections], None
+        except Exception as e:
+            payload, error = None, f"{type(e).__name__}: {e}"
+        finally:
+            images = detections = None
+            for segment in segments:
+                _close_segment(segment)
+        results.put((seq, payload, error))
+
+
+class InferencePool:
+    """اجرای پیش‌بینی روی چند فرایند، هر کدام با مدل و تعداد thread ثابت خود
+
+    تصاویر از طریق shared memory به فرایندها داده می‌شوند (بدون pickle کردن آرایه‌ها) و
+    نتایج به ترتیب ارسال برگردانده می‌شوند. حافظه‌های مشترک بین درخواست‌ها دوباره استفاده می‌شوند.
+    """
+
+    def __init__(self, settings, workers=0, threads=None, pin=True):
+        cores = available_cores()
+        self.settings = settings
+        self.workers = workers or auto_workers()
+        self.threads = threads or max(1, len(cores) // self.workers)
+        self.pin = pin
+        self.names = {}
+
+        context = multiprocessing.get_context("spawn")
+        self._context = context
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._processes = []
+
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._gather_lock = threading.Lock()
+        self._free = []
+        self._in_use = {}
+        self._done = {}
+
+    def worker_cores(self, index):
+        """هسته‌های اختصاص‌یافته به یک فرایند (در صورت کافی بودن هسته‌ها، بدون همپوشانی)"""
+        cores = available_cores()
+        if not self.pin or len(cores) < self.workers * self.threads:
+            return None
+        return cores[index * self.threads:(index + 1) * self.threads]
+
+    def start(self):
+        """راه‌اندازی فرایندها و انتظار تا بارگذاری و گرم شدن مدل در همه آن‌ها"""
+        for index in range(self.workers):
+            process = self._context.Process(target=_worker_main, name=f"yolo-worker-{index}", daemon=True,
+                                            args=(index, self.settings, self.threads, self.worker_cores(index),
+                                                  self._tasks, self._results))
+            process.start()
+            self._processes.append(process)
+
+        ready = 0
+        deadline = time.monotonic() + START_TIMEOUT
+        while ready < self.workers:
+            try:
+                tag, index, value = self._results.get(timeout=POLL_TIMEOUT)
+            except queue.Empty:
+                if time.monotonic() > deadline or not all(p.is_alive() for p in self._processes):
+                    self.close()
+                    raise RuntimeError("Inference workers failed to start")
+                continue
+            if isinstance(value, str):
+                self.close()
+                raise RuntimeError(f"Inference worker {index} failed to load the model: {value}")
+            self.names = value
+            ready += 1
+
+    @property
+    def in_flight(self):
+        """تعداد بخش‌هایی که ارسال شده‌اند ولی نتیجه‌شان هنوز خوانده نشده است"""
+        with self._lock:
+            return len(self._in_use) + len(self._done)
+
+    def _acquire(self, nbytes):
+        """گرفتن حافظه مشترکی با اندازه حداقل nbytes (کوچک‌ترین حافظه آزاد مناسب یا یک حافظه جدید)"""
+        with self._lock:
+            fitting = [segment for segment in self._free if segment.size >= nbytes]
+            if fitting:
+                segment = min(fitting, key=lambda s: s.size)
+                self._free.remove(segment)
+                return segment
+        return shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+
+    def _copy_in(self, image):
+        pixels = image.pixels
+        segment = self._acquire(pixels.nbytes)
+        view = np.ndarray(pixels.shape, dtype=np.uint8, buffer=segment.buf)
+        np.copyto(view, pixels)
+        del view
+        return segment, (segment.name, pixels.shape)
+
+    def submit(self, images):
+        """ارسال تصاویر بین فرایندها (هر فرایند یک بخش)؛ یک ticket برای gather برمی‌گرداند"""
+        ticket = []
+        for chunk in np.array_split(np.arange(len(images)), min(self.workers, len(images))):
+            copies = [self._copy_in(images[i]) for i in chunk]
+            seq = next(self._seq)
+            with self._lock:
+                self._in_use[seq] = [segment for segment, _ in copies]
+            self._tasks.put((seq, [frame for _, frame in copies]))
+            ticket.append(seq)
+        return ticket
+
+    def gather(self, ticket):
+        """انتظار برای نتایج یک ticket و برگرداندن Detections به ترتیب تصاویر ارسال‌شده"""
+        detections, errors = [], []
+        for seq in ticket:
+            payload, error = self._wait(seq)
+            if error is not None:
+                errors.append(error)
+            elif not errors:
+                detections.extend(Detections(xyxy, conf, cls, self.names) for xyxy, conf, cls in payload)
+        if errors:
+            raise RuntimeError(errors[0])
+        return detections
+
+    def detect(self, images):
+        if not images:
+            return []
+        return self.gather(self.submit(images))
+
+    def _wait(self, seq):
+        while True:
+            with self._lock:
+                if seq in self._done:
+                    return self._done.pop(seq)
+
+            # فقط یک thread از صف نتایج می‌خواند و نتایج بقیه را در _done می‌گذارد
+            with self._gather_lock:
+                with self._lock:
+                    if seq in self._done:
+                        continue
+                try:
+                    done_seq, payload, error = self._results.get(timeout=POLL_TIMEOUT)
+                except queue.Empty:
+                    if not all(process.is_alive() for process in self._processes):
+                        raise RuntimeError("An inference worker process exited unexpectedly")
+                    continue
+                with self._lock:
+                    self._free.extend(self._in_use.pop(done_seq, []))
+                    self._done[done_seq] = (payload, error)
+
+    def close(self):
+        """متوقف کردن فرایندها و آزاد کردن حافظه‌های مشترک"""
+        for process in self._processes:
+            if process.is_alive():
+                self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+
+        with self._lock:
+            segments = self._free + [segment for items in self._in_use.values() for segment in items]
+            self._free, self._in_use, self._done = [], {}, {}
+        for segment in segments:
+            _close_segment(segment)
+            segment.unlink()
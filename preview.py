@@ -0,0 +1,181 @@
+import os
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from imaging import file_signature, fit_size, is_image_file, PREVIEW_SIZE
+from profiling import profiler
+
+# کیفیت پیش‌نمایش: سریع (draft + BILINEAR) یا نهایی (LANCZOS)
+QUALITY_DRAFT = "draft"
+QUALITY_REFINED = "refined"
+
+# تعداد پیش‌نمایش‌های نگه‌داشته‌شده و تعداد فایل‌های همسایه برای پیش‌خوانی
+DEFAULT_CACHE_ENTRIES = 64
+DEFAULT_PREFETCH = 2
+
+
+def decode_preview(path, max_size=PREVIEW_SIZE, quality=QUALITY_DRAFT):
+    """decode کوچک‌شده یک تصویر بدون decode کامل آن
+
+    برای JPEG از draft استفاده می‌شود تا decoder مستقیما با مقیاس 1/2، 1/4 یا 1/8 خروجی دهد.
+    در حالت نهایی draft در دو برابر اندازه هدف گرفته و با LANCZOS کوچک می‌شود.
+    خروجی (پیش‌نمایش RGB، اندازه اصلی تصویر) است.
+    """
+    with profiler.stage("preview"):
+        image = Image.open(path)
+        original_size = image.size
+        target = fit_size(*original_size, max_size)
+
+        draft_size = target if quality == QUALITY_DRAFT else (target[0] * 2, target[1] * 2)
+        if image.format == "JPEG":
+            image.draft("RGB", draft_size)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+
+        if quality == QUALITY_DRAFT:
+            preview = image.resize(target, Image.Resampling.BILINEAR, reducing_gap=2.0)
+        else:
+            preview = image.resize(target, Image.Resampling.LANCZOS)
+    return preview, original_size
+
+
+def folder_images(path):
+    """فایل‌های تصویری پوشه یک فایل به ترتیب نام"""
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        names = sorted(name for name in os.listdir(directory) if is_image_file(name))
+    except OSError:
+        return []
+    return [os.path.join(directory, name) for name in names]
+
+
+def neighbours(path, count=DEFAULT_PREFETCH):
+    """فایل‌های قبلی و بعدی یک تصویر در همان پوشه (نزدیک‌ترها اول)"""
+    files = folder_images(path)
+    try:
+        index = files.index(os.path.abspath(path))
+    except ValueError:
+        return []
+    result = []
+    for offset in range(1, count + 1):
+        for position in (index + offset, index - offset):
+            if 0 <= position < len(files):
+                result.append(files[position])
+    return result
+
+
+class PreviewCache:
+    """LRU پیش‌نمایش‌ها با کلید (مسیر، mtime، اندازه فایل، اندازه پیش‌نمایش)"""
+
+    def __init__(self, max_entries=DEFAULT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        """ذخیره (پیش‌نمایش، اندازه اصلی، کیفیت)؛ پیش‌نمایش نهایی با نسخه سریع جایگزین نمی‌شود"""
+        with self._lock:
+            current = self._entries.get(key)
+            if current is not None and current[2] == QUALITY_REFINED and entry[2] == QUALITY_DRAFT:
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class PreviewLoader:
+    """ساخت پیش‌نمایش‌ها با cache، بهبود کیفیت در پس‌زمینه و پیش‌خوانی فایل‌های همسایه
+
+    get() روی همان thread فراخوان اجرا می‌شود؛ refine() و prefetch() روی thread‌های پس‌زمینه
+    اجرا می‌شوند و پیش‌نمایش‌های نهایی با poll() برگردانده می‌شوند.
+    """
+
+    def __init__(self, max_size=PREVIEW_SIZE, max_entries=DEFAULT_CACHE_ENTRIES, refine=True, workers=2):
+        self.max_size = max_size
+        self.refine_enabled = refine
+        self.cache = PreviewCache(max_entries)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="preview")
+        self._results = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def _key(self, path):
+        return (os.path.abspath(path),) + file_signature(path) + (self.max_size,)
+
+    def get(self, path):
+        """پیش‌نمایش یک تصویر: (تصویر، اندازه اصلی، کیفیت)؛ از cache یا با decode سریع"""
+        key = self._key(path)
+        entry = self.cache.get(key)
+        if entry is None:
+            preview, original_size = decode_preview(path, self.max_size, QUALITY_DRAFT)
+            entry = (preview, original_size, QUALITY_DRAFT)
+            self.cache.put(key, entry)
+        return entry
+
+    def refine(self, path):
+        """ساخت پیش‌نمایش با کیفیت نهایی در پس‌زمینه (در صورت فعال بودن)"""
+        if self.refine_enabled:
+            self._schedule(path, notify=True)
+
+    def prefetch(self, paths):
+        """ساخت پیش‌نمایش فایل‌های بعدی در پس‌زمینه تا مرور پوشه بدون تاخیر باشد"""
+        for path in paths:
+            self._schedule(path, notify=False)
+
+    def _schedule(self, path, notify):
+        try:
+            key = self._key(path)
+        except OSError:
+            return
+        entry = self.cache.get(key)
+        wanted = QUALITY_REFINED if self.refine_enabled else QUALITY_DRAFT
+        if entry is not None and (entry[2] == wanted or entry[2] == QUALITY_REFINED):
+            if notify:
+                self._results.put((path, entry))
+            return
+        with self._lock:
+            if (key, notify) in self._pending:
+                return
+            self._pending.add((key, notify))
+        self._executor.submit(self._build, path, key, wanted, notify)
+
+    def _build(self, path, key, quality, notify):
+        try:
+            preview, original_size = decode_preview(path, self.max_size, quality)
+            entry = (preview, original_size, quality)
+            self.cache.put(key, entry)
+            if notify:
+                self._results.put((path, entry))
+        except Exception:
+            # فایل خراب یا حذف‌شده؛ هنگام باز کردن مستقیم خطای آن نمایش داده می‌شود
+            pass
+        finally:
+            with self._lock:
+                self._pending.discard((key, notify))
+
+    def poll(self):
+        """پیش‌نمایش‌های نهایی آماده [(مسیر، (تصویر، اندازه اصلی، کیفیت))] بدون بلاک شدن"""
+        completed = []
+        while True:
+            try:
+                completed.append(self._results.get_nowait())
+            except queue.Empty:
+                return completed
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,162 @@
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# تعداد نمونه‌های اخیر نگه‌داشته‌شده در ring buffer
+DEFAULT_CAPACITY = 4096
+
+# انواع profiler قابل فعال‌سازی برای یک درخواست
+CAPTURE_CPROFILE = "cprofile"
+CAPTURE_TORCH = "torch"
+
+
+def memory_mb():
+    """حافظه فعلی فرایند (RSS به MB)؛ در صورت عدم دسترسی بیشترین مقدار ثبت‌شده"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        return None
+
+
+class Profiler:
+    """ثبت سبک زمان هر مرحله و شمارنده‌ها در یک ring buffer
+
+    هر نمونه (نام مرحله، زمان شروع، مدت، شناسه thread) است و زمان‌ها به ثانیه با perf_counter ثبت می‌شوند.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.enabled = True
+        self.capture_dir = "."
+        self.last_capture = None
+
+        self._samples = deque(maxlen=capacity)
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._capture_kind = None
+
+    @contextmanager
+    def stage(self, name):
+        """اندازه‌گیری زمان یک مرحله"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter() - start)
+
+    def record(self, name, start, duration):
+        with self._lock:
+            self._samples.append((name, start, duration, threading.get_ident()))
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    @property
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def samples(self):
+        with self._lock:
+            return list(self._samples)
+
+    def stage_names(self):
+        """نام مراحل به ترتیب اولین ثبت"""
+        return list(dict.fromkeys(name for name, _, _, _ in self.samples()))
+
+    def durations(self, name):
+        """مدت نمونه‌های اخیر یک مرحله (میلی‌ثانیه)"""
+        return np.array([duration for stage, _, duration, _ in self.samples() if stage == name]) * 1000
+
+    def summary(self):
+        """p50/p95/p99 هر مرحله روی نمونه‌های موجود در ring buffer (میلی‌ثانیه)"""
+        result = {}
+        for name in self.stage_names():
+            values = self.durations(name)
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            result[name] = {"n": int(values.size), "p50": float(p50), "p95": float(p95), "p99": float(p99)}
+        return result
+
+    def throughput(self, name, window=10.0):
+        """تعداد اجرای یک مرحله در ثانیه در بازه زمانی اخیر"""
+        now = time.perf_counter()
+        recent = [start for stage, start, _, _ in self.samples() if stage == name and start >= now - window]
+        if not recent:
+            return 0.0
+        return len(recent) / max(now - min(recent), 1e-6)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._counters.clear()
+
+    def export_chrome_trace(self, path):
+        """خروجی نمونه‌ها در قالب Chrome trace JSON (قابل باز کردن در chrome://tracing یا Perfetto)"""
+        pid = os.getpid()
+        events = [{"name": name, "ph": "X", "ts": start * 1e6, "dur": duration * 1e6, "pid": pid, "tid": tid}
+                  for name, start, duration, tid in self.samples()]
+        counters = self.counters
+        if counters:
+            events.append({"name": "counters", "ph": "C", "ts": time.perf_counter() * 1e6, "pid": pid,
+                           "args": counters})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def capture_next(self, kind=CAPTURE_CPROFILE):
+        """فعال کردن cProfile یا torch profiler فقط برای درخواست بعدی"""
+        self._capture_kind = kind
+
+    @contextmanager
+    def capture(self):
+        """اجرای یک درخواست زیر profiler در صورتی که با capture_next فعال شده باشد"""
+        kind, self._capture_kind = self._capture_kind, None
+        if kind is None:
+            yield
+            return
+
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        if kind == CAPTURE_TORCH:
+            from torch.profiler import profile, ProfilerActivity
+
+            path = os.path.join(self.capture_dir, f"torch-profile-{stamp}.json")
+            with profile(activities=[ProfilerActivity.CPU], record_shapes=True) as torch_profile:
+                yield
+            torch_profile.export_chrome_trace(path)
+        else:
+            path = os.path.join(self.capture_dir, f"profile-{stamp}.prof")
+            c_profile = cProfile.Profile()
+            c_profile.enable()
+            try:
+                yield
+            finally:
+                c_profile.disable()
+                c_profile.dump_stats(path)
+        self.last_capture = path
+
+
+# نمونه مشترک برای تمام ماژول‌ها
+profiler = Profiler()
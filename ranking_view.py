@@ -0,0 +1,116 @@
+import tkinter as tk
+
+# رنگ پس‌زمینه سطرها بر اساس رتبه
+RANK_COLORS = ('#e8f5e8',  # سبز برای رتبه اول
+               '#e8f0ff',  # آبی برای رتبه دوم
+               '#fff8e8')  # زرد برای رتبه سوم
+DEFAULT_ROW_COLOR = '#f8f8f8'  # خاکستری روشن برای بقیه
+
+# حداقل فاصله بین دو بازسازی (یک فریم در 60Hz)
+REDRAW_INTERVAL_MS = 16
+
+
+class RankingRow:
+    """آیتم‌های canvas یک سطر رتبه‌بندی که یک بار ساخته و فقط به‌روز می‌شوند"""
+
+    def __init__(self, canvas, index, row_height):
+        self.index = index
+        self.value = None
+        top = index * row_height + 2
+        bottom = top + row_height - 4
+        middle = (top + bottom) / 2
+        color = RANK_COLORS[index] if index < len(RANK_COLORS) else DEFAULT_ROW_COLOR
+
+        self.top, self.bottom, self.middle = top, bottom, middle
+        self.background = canvas.create_rectangle(2, top, 100, bottom, fill=color, outline='#cccccc')
+        self.rank = canvas.create_text(14, middle, text=f"{index + 1}", font=('Arial', 12, 'bold'), anchor=tk.W)
+        self.label = canvas.create_text(44, middle, text="", font=('Arial', 10), anchor=tk.W)
+        self.trough = canvas.create_rectangle(0, middle - 5, 80, middle + 5, fill='#e6e6e6', outline='#bcbcbc')
+        self.bar = canvas.create_rectangle(0, middle - 5, 0, middle + 5, fill='#06b025', outline='')
+        self.confidence = canvas.create_text(0, middle, text="", font=('Arial', 10, 'bold'),
+                                             fill='#007acc', anchor=tk.E)
+        self.items = (self.background, self.rank, self.label, self.trough, self.bar, self.confidence)
+
+
+class RankingView:
+    """نمایش رتبه‌بندی کلاس‌ها روی canvas با مجموعه ثابتی از سطرها
+
+    به جای ساختن و حذف ویجت‌ها در هر تحلیل، فقط متن و مقدار سطرهایی که تغییر کرده‌اند
+    به‌روز می‌شود و چند درخواست پشت سر هم در یک بازسازی ادغام می‌شوند.
+    """
+
+    ROW_HEIGHT = 36
+    BAR_LENGTH = 80
+
+    def __init__(self, canvas, max_rows=10):
+        self.canvas = canvas
+        self.width = 0
+        self.visible_rows = 0
+        self.rows = [RankingRow(canvas, i, self.ROW_HEIGHT) for i in range(max_rows)]
+        for row in self.rows:
+            for item in row.items:
+                canvas.itemconfigure(item, state=tk.HIDDEN)
+
+        self._pending = None
+        self._scheduled = None
+
+    def update(self, ranking):
+        """ثبت رتبه‌بندی جدید [(نام کلاس، confidence، تعداد)]؛ نمایش حداکثر یک بار در هر فریم"""
+        self._pending = list(ranking[:len(self.rows)])
+        if self._scheduled is None:
+            self._scheduled = self.canvas.after(REDRAW_INTERVAL_MS, self._redraw)
+
+    def clear(self):
+        self.update([])
+
+    def resize(self, width):
+        """جابه‌جایی اجزای سمت راست سطرها هنگام تغییر عرض canvas"""
+        if width == self.width:
+            return
+        self.width = width
+        right = width - 4
+        for row in self.rows:
+            self.canvas.coords(row.background, 2, row.top, right, row.bottom)
+            self.canvas.coords(row.confidence, right - 10, row.middle)
+            bar_left = right - 75 - self.BAR_LENGTH
+            self.canvas.coords(row.trough, bar_left, row.middle - 5, bar_left + self.BAR_LENGTH, row.middle + 5)
+            self._set_bar(row)
+        self._update_scrollregion()
+
+    def _set_bar(self, row):
+        x0, y0, _, y1 = self.canvas.coords(row.trough)
+        confidence = row.value[1] if row.value is not None else 0.0
+        self.canvas.coords(row.bar, x0, y0, x0 + self.BAR_LENGTH * confidence, y1)
+
+    def _update_scrollregion(self):
+        self.canvas.configure(scrollregion=(0, 0, self.width, self.visible_rows * self.ROW_HEIGHT + 4))
+
+    def _redraw(self):
+        self._scheduled = None
+        ranking, self._pending = self._pending, None
+        if ranking is None:
+            return
+
+        for i, row in enumerate(self.rows):
+            value = ranking[i] if i < len(ranking) else None
+            if value == row.value:
+                continue
+
+            if value is None:
+                for item in row.items:
+                    self.canvas.itemconfigure(item, state=tk.HIDDEN)
+            else:
+                class_name, confidence, count = value
+                if row.value is None:
+                    for item in row.items:
+                        self.canvas.itemconfigure(item, state=tk.NORMAL)
+                if row.value is None or row.value[0] != class_name or row.value[2] != count:
+                    self.canvas.itemconfigure(row.label, text=f"{class_name} (x{count})")
+                if row.value is None or row.value[1] != confidence:
+                    self.canvas.itemconfigure(row.confidence, text=f"{confidence:.3f}")
+            row.value = value
+            self._set_bar(row)
+
+        if len(ranking) != self.visible_rows:
+            self.visible_rows = len(ranking)
+            self._update_scrollregion()
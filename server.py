@@ -0,0 +1,317 @@
+import asyncio
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+from batch import add_model_arguments, engine_from_args, make_record
+from cache import DetectionCache
+from imaging import DecodedImage
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# محدودیت‌های پیش‌فرض micro-batching و backpressure
+DEFAULT_MAX_BATCH = 8
+DEFAULT_MAX_WAIT_MS = 10
+DEFAULT_MAX_QUEUE = 64
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 431: "Request Header Fields Too Large",
+               500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class Overloaded(Exception):
+    """صف درخواست‌ها پر است"""
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class MicroBatcher:
+    """جمع کردن درخواست‌های همزمان در یک فراخوانی predict (حداکثر max_batch تصویر یا max_wait_ms)
+
+    مدل فقط روی یک thread اجرا می‌شود؛ اگر صف پر باشد درخواست جدید با Overloaded رد می‌شود.
+    """
+
+    def __init__(self, engine, max_batch=DEFAULT_MAX_BATCH, max_wait_ms=DEFAULT_MAX_WAIT_MS,
+                 max_queue=DEFAULT_MAX_QUEUE):
+        self.engine = engine
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="yolo-batch")
+
+        self.batches = 0
+        self.images = 0
+        self.rejected = 0
+        self.batch_sizes = deque(maxlen=1000)
+
+    async def submit(self, image):
+        """ارسال یک تصویر و انتظار برای Detections آن"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((image, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise Overloaded()
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            # جمع کردن درخواست‌های بعدی تا پر شدن batch یا پایان مهلت
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            images = [image for image, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.engine.detect, images)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.images += len(batch)
+            self.batch_sizes.append(len(batch))
+            for (_, future), detections in zip(batch, results):
+                if not future.done():
+                    future.set_result(detections)
+
+
+class DetectionServer:
+    """سرویس HTTP محلی (asyncio) برای تشخیص با همان موتور رابط گرافیکی"""
+
+    def __init__(self, engine, max_batch=DEFAULT_MAX_BATCH, max_wait_ms=DEFAULT_MAX_WAIT_MS,
+                 max_queue=DEFAULT_MAX_QUEUE, decode_workers=4):
+        self.engine = engine
+        self.batcher_options = (max_batch, max_wait_ms, max_queue)
+        self.batcher = None
+        self.decoder = ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix="decode")
+
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=2000)
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.batcher = MicroBatcher(self.engine, *self.batcher_options)
+        batch_task = asyncio.create_task(self.batcher.run())
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Serving {self.engine.describe()} on http://{host}:{port}", file=sys.stderr)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batch_task.cancel()
+
+    async def handle_connection(self, reader, writer):
+        """پردازش درخواست‌های یک اتصال (با پشتیبانی از keep-alive)"""
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except HttpError as e:
+                    # وضعیت جریان ورودی پس از درخواست نامعتبر مشخص نیست؛ اتصال بسته می‌شود
+                    self.errors += 1
+                    await self.write_response(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+
+                start_time = time.perf_counter()
+                status, payload = await self.dispatch(method, target, headers, body)
+                if target.startswith("/detect"):
+                    self.latencies.append(time.perf_counter() - start_time)
+
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await self.write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        """خواندن یک درخواست HTTP/1.1؛ در پایان اتصال None و برای درخواست نامعتبر HttpError"""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            raise HttpError(431, "request header block too large")
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HttpError(400, "malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise HttpError(400, "invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            # بدنه خوانده نمی‌شود؛ پاسخ 413 داده و اتصال بسته می‌شود
+            return method, target, dict(headers, connection="close"), None
+        body = await reader.readexactly(length) if length else b""
+        return method, target, headers, body
+
+    async def write_response(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        headers = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+                   "Content-Type: application/json; charset=utf-8",
+                   f"Content-Length: {len(body)}",
+                   f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if status == 503:
+            headers.append("Retry-After: 1")
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def dispatch(self, method, target, headers, body):
+        """مسیریابی درخواست؛ خروجی (کد وضعیت، بدنه JSON)"""
+        url = urlsplit(target)
+        if body is None:
+            return 413, {"error": f"request body larger than {MAX_BODY_BYTES} bytes"}
+        try:
+            if url.path == "/health":
+                return 200, self.health()
+            if url.path == "/metrics":
+                return 200, self.metrics()
+            if url.path == "/detect":
+                if method != "POST":
+                    raise HttpError(405, "POST image bytes to /detect")
+                return 200, await self.detect_upload(body, headers)
+            if url.path == "/detect/path":
+                if method == "GET":
+                    path = parse_qs(url.query).get("path", [None])[0]
+                elif method == "POST":
+                    try:
+                        data = json.loads(body or b"{}")
+                    except ValueError:
+                        raise HttpError(400, "body is not valid JSON")
+                    if not isinstance(data, dict):
+                        raise HttpError(400, "body must be a JSON object like {\"path\": ...}")
+                    path = data.get("path")
+                    if path is not None and not isinstance(path, str):
+                        raise HttpError(400, "'path' must be a string")
+                else:
+                    raise HttpError(405, "use GET ?path= or POST {\"path\": ...}")
+                if not path:
+                    raise HttpError(400, "missing 'path'")
+                return 200, await self.detect_path(path)
+            raise HttpError(404, f"unknown endpoint {url.path}")
+        except Overloaded:
+            return 503, {"error": "server overloaded, retry later"}
+        except HttpError as e:
+            return e.status, {"error": str(e)}
+        except Exception as e:
+            self.errors += 1
+            return 500, {"error": str(e)}
+
+    async def detect_upload(self, body, headers):
+        if not body:
+            raise HttpError(400, "empty request body")
+        self.requests += 1
+        loop = asyncio.get_running_loop()
+        try:
+            image = await loop.run_in_executor(self.decoder, DecodedImage.from_bytes, body,
+                                               headers.get("x-filename"))
+        except Exception as e:
+            raise HttpError(400, f"cannot decode image: {e}")
+        return await self.detect_image(image, image.name or "upload")
+
+    async def detect_path(self, path):
+        self.requests += 1
+        loop = asyncio.get_running_loop()
+        try:
+            image = await loop.run_in_executor(self.decoder, DecodedImage.open, path)
+        except Exception as e:
+            raise HttpError(400, f"cannot open image: {e}")
+        return await self.detect_image(image, path)
+
+    async def detect_image(self, image, name):
+        start_time = time.perf_counter()
+        detections = await self.batcher.submit(image)
+        return make_record(name, detections, time.perf_counter() - start_time)
+
+    def health(self):
+        return {"status": "ok" if self.engine.loaded else "loading",
+                "model": self.engine.describe(),
+                "queue": self.batcher.queue.qsize() if self.batcher else 0}
+
+    def metrics(self):
+        """آمار سرویس: تعداد درخواست‌ها، اندازه batch‌ها، تاخیر و توان عملیاتی"""
+        latencies = np.array(self.latencies) * 1000
+        batcher = self.batcher
+        uptime = time.time() - self.started
+        metrics = {"uptime_s": uptime, "requests": self.requests, "errors": self.errors,
+                   "rejected": batcher.rejected, "batches": batcher.batches, "images": batcher.images,
+                   "images_per_sec": batcher.images / uptime if uptime > 0 else 0.0,
+                   "queue_depth": batcher.queue.qsize(), "queue_limit": batcher.queue.maxsize,
+                   "mean_batch_size": float(np.mean(batcher.batch_sizes)) if batcher.batch_sizes else 0.0}
+        if latencies.size:
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            metrics["latency_ms"] = {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+        if self.engine.cache is not None:
+            metrics["cache"] = {"hits": self.engine.cache.hits, "misses": self.engine.cache.misses}
+        return metrics
+
+
+def add_arguments(parser):
+    """آرگومان‌های خط فرمان سرویس HTTP"""
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="max images per predict call")
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help="max time to wait for a batch to fill")
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE,
+                        help="queued requests before answering 503")
+    parser.add_argument("--decode-workers", type=int, default=4)
+    parser.add_argument("--cache", metavar="PATH", help="SQLite detection cache")
+    add_model_arguments(parser)
+
+
+def run(args):
+    """اجرای سرویس HTTP"""
+    cache = DetectionCache(path=args.cache) if args.cache else None
+    engine = engine_from_args(args, cache=cache)
+    engine.load()
+
+    server = DetectionServer(engine, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms,
+                             max_queue=args.max_queue, decode_workers=args.decode_workers)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.close()
+    return 0
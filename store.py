@@ -0,0 +1,352 @@
+import os
+import re
+import sys
+import threading
+import time
+
+import numpy as np
+
+# محل پیش‌فرض فایل store کنار cache نتایج
+DEFAULT_STORE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "yolo11_app", "detections_store.npz")
+
+# وقتی ردیف‌های خارج از index از این نسبت بیشتر شوند index دوباره ساخته می‌شود
+REINDEX_FRACTION = 0.1
+
+# فاصله زمانی (ثانیه) ذخیره خودکار تغییرات تا با crash برنامه نتایج جلسه از دست نروند
+AUTOSAVE_INTERVAL = 30.0
+
+# نام کلاس ویژه برای شرط روی همه کلاس‌ها
+ANY_CLASS = "*"
+
+_CONDITION = re.compile(r"^\s*(?P<name>[^>=@]+?)\s*(?:>=\s*(?P<count>\d+))?\s*(?:@\s*(?P<conf>\d*\.?\d+))?\s*$")
+
+
+class Column:
+    """آرایه NumPy قابل رشد (با دو برابر کردن ظرفیت) برای افزودن سریع ردیف‌ها"""
+
+    def __init__(self, dtype, width=None, data=None):
+        shape = (0,) if width is None else (0, width)
+        self._data = np.zeros(shape, dtype=dtype) if data is None else np.array(data, dtype=dtype)
+        self._size = len(self._data)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def data(self):
+        return self._data[:self._size]
+
+    def append(self, values):
+        values = np.asarray(values, dtype=self._data.dtype)
+        end = self._size + len(values)
+        if end > len(self._data):
+            capacity = max(end, 2 * len(self._data), 1024)
+            grown = np.zeros((capacity,) + self._data.shape[1:], dtype=self._data.dtype)
+            grown[:self._size] = self.data
+            self._data = grown
+        self._data[self._size:end] = values
+        self._size = end
+
+
+class QueryResult:
+    """نتیجه یک جستجو: شناسه تصاویر و تعداد detection هر شرط برای هر تصویر"""
+
+    def __init__(self, image_ids, counts, paths, elapsed):
+        self.image_ids = image_ids
+        self.counts = counts
+        self.paths = paths
+        self.elapsed = elapsed
+
+    def __len__(self):
+        return len(self.image_ids)
+
+
+def parse_query(text, names):
+    """تبدیل متن جستجو به لیست شرط‌ها [(شناسه کلاس یا None، حداقل تعداد، حداقل confidence)]
+
+    مثال: "person>=3@0.6, dog@0.5" یعنی حداقل 3 person با confidence بالای 0.6 و حداقل یک dog
+    با confidence بالای 0.5. "*>=10" یعنی حداقل 10 شیء از هر کلاسی.
+    """
+    class_ids = {name.lower(): class_id for class_id, name in names.items()}
+    conditions = []
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        match = _CONDITION.match(part)
+        if match is None:
+            raise ValueError(f"Invalid condition: {part.strip()!r} (expected e.g. person>=3@0.6)")
+        name = match.group("name").strip().lower()
+        if name == ANY_CLASS:
+            class_id = None
+        elif name in class_ids:
+            class_id = class_ids[name]
+        else:
+            raise ValueError(f"Unknown class: {name}")
+        conditions.append((class_id, int(match.group("count") or 1), float(match.group("conf") or 0.0)))
+    if not conditions:
+        raise ValueError("Empty query")
+    return conditions
+
+
+class DetectionStore:
+    """ذخیره ستونی همه detection‌های تحلیل‌شده (GUI و batch) با index کلاس برای جستجوی سریع
+
+    هر detection یک ردیف با ستون‌های تایپ‌شده است: image (int32)، cls (int32)، conf (float32)،
+    xyxy (float32 × 4). ردیف‌های هر تصویر پشت سر هم هستند؛ تحلیل دوباره یک تصویر ردیف‌های قبلی را
+    غیرفعال می‌کند. index کلاس‌ها (مرتب بر اساس کلاس و confidence نزولی) تنبل ساخته می‌شود و
+    ردیف‌های جدیدتر از index به صورت خطی بررسی می‌شوند.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.names = {}
+        self.image_paths = []
+
+        self._image_ids = {}
+        self._image_start = Column(np.int64)
+        self._image_stop = Column(np.int64)
+
+        self._image = Column(np.int32)
+        self._cls = Column(np.int32)
+        self._conf = Column(np.float32)
+        self._xyxy = Column(np.float32, width=4)
+        self._live = Column(np.bool_)
+        self._dead = 0
+
+        self._index_rows = 0
+        self._index_order = np.zeros(0, dtype=np.int64)
+        self._index_neg_conf = np.zeros(0, dtype=np.float32)
+        self._index_offsets = np.zeros(1, dtype=np.int64)
+
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+        self._lock = threading.RLock()
+
+    @classmethod
+    def open(cls, path=DEFAULT_STORE_PATH):
+        """باز کردن store از فایل .npz (در صورت وجود)"""
+        store = cls(path)
+        if path is not None and os.path.exists(path):
+            store._load(path)
+        return store
+
+    def __len__(self):
+        """تعداد detection‌های فعال"""
+        return len(self._image) - self._dead
+
+    @property
+    def image_count(self):
+        return len(self.image_paths)
+
+    @property
+    def nbytes(self):
+        columns = (self._image, self._cls, self._conf, self._xyxy, self._live)
+        return sum(column.data.nbytes for column in columns)
+
+    def add(self, image_path, detections):
+        """افزودن نتایج یک تصویر؛ نتایج قبلی همان تصویر غیرفعال می‌شوند"""
+        count = len(detections)
+        with self._lock:
+            self.names.update(detections.names)
+            start = len(self._image)
+
+            image_id = self._image_ids.get(image_path)
+            if image_id is None:
+                image_id = len(self.image_paths)
+                self._image_ids[image_path] = image_id
+                self.image_paths.append(image_path)
+                self._image_start.append([start])
+                self._image_stop.append([start + count])
+            else:
+                old_start, old_stop = self._image_start.data[image_id], self._image_stop.data[image_id]
+                self._live.data[old_start:old_stop] = False
+                self._dead += int(old_stop - old_start)
+                self._image_start.data[image_id] = start
+                self._image_stop.data[image_id] = start + count
+
+            if count:
+                self._image.append(np.full(count, image_id, dtype=np.int32))
+                self._cls.append(detections.cls)
+                self._conf.append(detections.conf)
+                self._xyxy.append(detections.xyxy)
+                self._live.append(np.ones(count, dtype=np.bool_))
+            self._unsaved += 1
+        return image_id
+
+    def image_detections(self, image_id):
+        """ستون‌های (cls, conf, xyxy) فعال یک تصویر"""
+        with self._lock:
+            start, stop = self._image_start.data[image_id], self._image_stop.data[image_id]
+            return self._cls.data[start:stop], self._conf.data[start:stop], self._xyxy.data[start:stop]
+
+    def _build_index(self):
+        """مرتب کردن ردیف‌ها بر اساس (کلاس، confidence نزولی) و محاسبه محدوده هر کلاس"""
+        rows = len(self._image)
+        cls = self._cls.data
+        neg_conf = -self._conf.data
+        # یک کلید float به جای lexsort: بخش صحیح کلاس و بخش اعشاری confidence نزولی (conf در [0, 1])
+        order = np.argsort(cls + (1.0 + neg_conf.astype(np.float64)) * 0.5, kind="stable")
+        sorted_cls = cls[order]
+        max_class = int(sorted_cls[-1]) if rows else -1
+
+        self._index_order = order
+        self._index_neg_conf = neg_conf[order]
+        self._index_offsets = np.searchsorted(sorted_cls, np.arange(max_class + 2))
+        self._index_rows = rows
+
+    def _ensure_index(self):
+        rows = len(self._image)
+        if rows - self._index_rows > max(REINDEX_FRACTION * self._index_rows, 1024):
+            self._build_index()
+
+    def _matching_rows(self, class_id, min_conf):
+        """شماره ردیف‌های فعال یک کلاس (یا همه کلاس‌ها) با confidence حداقل min_conf"""
+        conf = self._conf.data
+        if class_id is None:
+            rows = np.flatnonzero(conf >= min_conf)
+        else:
+            parts = []
+            if class_id + 1 < len(self._index_offsets):
+                low, high = self._index_offsets[class_id], self._index_offsets[class_id + 1]
+                # confidence منفی صعودی است؛ ردیف‌های conf >= min_conf یک پیشوند هستند
+                cut = np.searchsorted(self._index_neg_conf[low:high], -min_conf, side="right")
+                parts.append(self._index_order[low:low + cut])
+
+            # ردیف‌های اضافه‌شده بعد از ساخت index
+            tail = slice(self._index_rows, len(self._image))
+            mask = (self._cls.data[tail] == class_id) & (conf[tail] >= min_conf)
+            parts.append(np.flatnonzero(mask) + self._index_rows)
+            rows = np.concatenate(parts)
+        return rows[self._live.data[rows]] if self._dead else rows
+
+    def query(self, conditions):
+        """تصاویری که همه شرط‌ها (شناسه کلاس یا None، حداقل تعداد، حداقل confidence) را دارند
+
+        conditions می‌تواند متن (مثل "person>=3@0.6") یا لیست شرط‌ها باشد.
+        """
+        start_time = time.perf_counter()
+        with self._lock:
+            if isinstance(conditions, str):
+                conditions = parse_query(conditions, self.names)
+            self._ensure_index()
+
+            image_count = len(self.image_paths)
+            image_column = self._image.data
+            selected = np.ones(image_count, dtype=bool)
+            counts = []
+            for class_id, min_count, min_conf in conditions:
+                rows = self._matching_rows(class_id, min_conf)
+                per_image = np.bincount(image_column[rows], minlength=image_count)
+                selected &= per_image >= min_count
+                counts.append(per_image)
+
+            image_ids = np.flatnonzero(selected)
+            counts = np.stack([c[image_ids] for c in counts], axis=1) if counts else np.zeros((0, 0))
+            paths = [self.image_paths[i] for i in image_ids]
+        return QueryResult(image_ids, counts, paths, time.perf_counter() - start_time)
+
+    def class_totals(self):
+        """تعداد detection‌های فعال هر کلاس {نام کلاس: تعداد}"""
+        with self._lock:
+            cls = self._cls.data[self._live.data] if self._dead else self._cls.data
+            totals = np.bincount(cls) if len(cls) else np.zeros(0, dtype=np.int64)
+        return {self.names.get(i, str(i)): int(n) for i, n in enumerate(totals) if n}
+
+    def stats_text(self):
+        return (f"Store: {len(self):,} detections in {self.image_count:,} images "
+                f"({self.nbytes / (1024 * 1024):.1f} MB)")
+
+    def maybe_save(self, interval=AUTOSAVE_INTERVAL):
+        """ذخیره در صورت وجود تغییر و گذشتن interval ثانیه از آخرین ذخیره؛ True اگر ذخیره شد"""
+        if not self._unsaved or time.monotonic() - self._saved_at < interval:
+            return False
+        self.save()
+        return True
+
+    def save(self, path=None):
+        """نوشتن store (فقط ردیف‌های فعال) در فایل .npz به صورت اتمی
+
+        نوشتن زیر قفل انجام می‌شود چون add ردیف‌های قبلی یک تصویر را در جا غیرفعال می‌کند.
+        """
+        path = path or self.path
+        if path is None:
+            return
+        with self._lock:
+            if self._dead:
+                self._compact()
+            name_ids = np.array(sorted(self.names), dtype=np.int32)
+            arrays = {
+                "image": self._image.data, "cls": self._cls.data, "conf": self._conf.data,
+                "xyxy": self._xyxy.data, "image_start": self._image_start.data,
+                "image_stop": self._image_stop.data,
+                "image_paths": np.array(self.image_paths, dtype=np.str_),
+                "name_ids": name_ids,
+                "name_values": np.array([self.names[i] for i in name_ids.tolist()], dtype=np.str_),
+            }
+
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f"{path}.tmp.npz"
+            np.savez(temp_path, **arrays)
+            os.replace(temp_path, path)
+            self._unsaved = 0
+            self._saved_at = time.monotonic()
+
+    def _compact(self):
+        """حذف ردیف‌های غیرفعال و به‌روزرسانی محدوده ردیف‌های هر تصویر"""
+        live = self._live.data
+        positions = np.concatenate([[0], np.cumsum(live)])
+        image_start = positions[self._image_start.data]
+        image_stop = positions[self._image_stop.data]
+
+        self._image = Column(np.int32, data=self._image.data[live])
+        self._cls = Column(np.int32, data=self._cls.data[live])
+        self._conf = Column(np.float32, data=self._conf.data[live])
+        self._xyxy = Column(np.float32, width=4, data=self._xyxy.data[live])
+        self._live = Column(np.bool_, data=np.ones(len(self._image), dtype=np.bool_))
+        self._image_start = Column(np.int64, data=image_start)
+        self._image_stop = Column(np.int64, data=image_stop)
+        self._dead = 0
+        self._index_rows = 0
+        self._index_offsets = np.zeros(1, dtype=np.int64)
+
+    def _load(self, path):
+        with np.load(path, allow_pickle=False) as data:
+            self._image = Column(np.int32, data=data["image"])
+            self._cls = Column(np.int32, data=data["cls"])
+            self._conf = Column(np.float32, data=data["conf"])
+            self._xyxy = Column(np.float32, width=4, data=data["xyxy"])
+            self._live = Column(np.bool_, data=np.ones(len(self._image), dtype=np.bool_))
+            self._image_start = Column(np.int64, data=data["image_start"])
+            self._image_stop = Column(np.int64, data=data["image_stop"])
+            self.image_paths = data["image_paths"].tolist()
+            self.names = dict(zip(data["name_ids"].tolist(), data["name_values"].tolist()))
+        self._image_ids = {path: i for i, path in enumerate(self.image_paths)}
+
+
+def add_arguments(parser):
+    """آرگومان‌های خط فرمان جستجو در store"""
+    parser.add_argument("query", help='conditions, e.g. "person>=3@0.6, dog@0.5" ("*" = any class)')
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH, help="detection store file (.npz)")
+    parser.add_argument("--limit", type=int, default=0, help="max images to print (0 = all)")
+
+
+def run(args):
+    """جستجو در نتایج ذخیره‌شده بدون اجرای دوباره مدل"""
+    if not os.path.exists(args.store):
+        print(f"Store not found: {args.store}", file=sys.stderr)
+        return 1
+    store = DetectionStore.open(args.store)
+    try:
+        result = store.query(args.query)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    shown = result.paths[:args.limit] if args.limit else result.paths
+    for path, counts in zip(shown, result.counts):
+        print(f"{path}\t{' '.join(str(int(c)) for c in counts)}")
+    print(f"{len(result)} images matched in {result.elapsed * 1000:.1f} ms ({store.stats_text()})",
+          file=sys.stderr)
+    return 0
@@ -0,0 +1,239 @@
+import threading
+import time
+from collections import deque
+
+from PIL import Image
+
+from imaging import PREVIEW_SIZE, fit_size
+
+# پسوندهای ویدیویی قابل انتخاب در رابط گرافیکی
+VIDEO_EXTENSIONS = ("*.mp4", "*.avi", "*.mov", "*.mkv", "*.webm")
+
+# نسبت هموارسازی نمایی برای محاسبه FPS و تاخیر
+EMA_ALPHA = 0.1
+
+
+class LatestQueue:
+    """صف محدود که در صورت پر بودن قدیمی‌ترین آیتم را دور می‌ریزد تا همیشه تازه‌ترین فریم بماند"""
+
+    def __init__(self, maxsize=1):
+        self._items = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """برداشتن قدیمی‌ترین آیتم باقی‌مانده؛ در صورت پایان زمان None"""
+        with self._cond:
+            if not self._items and not self._cond.wait_for(lambda: self._items, timeout):
+                return None
+            return self._items.popleft()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+    def get_latest(self):
+        """برداشتن تازه‌ترین آیتم بدون انتظار و دور ریختن بقیه"""
+        with self._cond:
+            if not self._items:
+                return None
+            self.dropped += len(self._items) - 1
+            item = self._items.pop()
+            self._items.clear()
+            return item
+
+
+class StageMeter:
+    """اندازه‌گیری FPS یک مرحله از pipeline با میانگین متحرک نمایی"""
+
+    def __init__(self):
+        self.fps = 0.0
+        self.count = 0
+        self._last = None
+
+    def tick(self):
+        now = time.perf_counter()
+        if self._last is not None:
+            interval = now - self._last
+            if interval > 0:
+                fps = 1.0 / interval
+                self.fps = fps if self.count <= 1 else (1 - EMA_ALPHA) * self.fps + EMA_ALPHA * fps
+        self._last = now
+        self.count += 1
+
+
+class FrameImage:
+    """فریم ویدیو با همان رابط DecodedImage تا موتور تشخیص و رسم کادرها بدون تغییر استفاده شوند"""
+
+    def __init__(self, pixels, index, captured_at):
+        self.path = None
+        self.pixels = pixels
+        self.index = index
+        self.captured_at = captured_at
+
+    @property
+    def size(self):
+        height, width = self.pixels.shape[:2]
+        return width, height
+
+    def preview(self, max_size=PREVIEW_SIZE):
+        """کوچک کردن مستقیم آرایه BGR و تبدیل به PIL فقط در اندازه پیش‌نمایش"""
+        import cv2
+
+        width, height = fit_size(*self.size, max_size)
+        small = cv2.resize(self.pixels, (width, height), interpolation=cv2.INTER_AREA)
+        return Image.fromarray(cv2.cvtColor(small, cv2.COLOR_BGR2RGB))
+
+
+class StreamFrame:
+    """خروجی نهایی pipeline برای نمایش"""
+
+    def __init__(self, frame, detections, display_image, inference_time):
+        self.frame = frame
+        self.detections = detections
+        self.display_image = display_image
+        self.inference_time = inference_time
+
+
+def parse_source(source):
+    """شماره دوربین به صورت عدد و بقیه (فایل، آدرس RTSP) به صورت رشته"""
+    source = str(source).strip()
+    return int(source) if source.isdigit() else source
+
+
+class StreamPipeline:
+    """pipeline چندمرحله‌ای decode → inference → annotate → display با صف‌های محدود
+
+    اگر inference عقب بماند فریم‌های قدیمی دور ریخته می‌شوند تا تاخیر انباشته نشود.
+    realtime=True یک فایل ویدیو را با سرعت واقعی آن پخش می‌کند (شبیه‌سازی جریان زنده).
+    """
+
+    def __init__(self, source, engine, renderer, realtime=False, loop=False, max_size=PREVIEW_SIZE):
+        self.source = parse_source(source)
+        self.engine = engine
+        self.renderer = renderer
+        self.realtime = realtime
+        self.loop = loop
+        self.max_size = max_size
+
+        # هر صف فقط تازه‌ترین آیتم را نگه می‌دارد تا مرحله بعد همیشه روی جدیدترین فریم کار کند
+        self.decoded_frames = LatestQueue(maxsize=1)
+        self.detected_frames = LatestQueue(maxsize=1)
+        self.output = LatestQueue(maxsize=1)
+
+        self.meters = {name: StageMeter() for name in ("decode", "inference", "annotate", "display")}
+        self.latency = 0.0
+        self.error = None
+
+        self._stop = threading.Event()
+        self._decode_thread = threading.Thread(target=self._decode_loop, name="stream-decode", daemon=True)
+        self._inference_thread = threading.Thread(target=self._inference_loop, name="stream-inference",
+                                                  daemon=True)
+        self._annotate_thread = threading.Thread(target=self._annotate_loop, name="stream-annotate",
+                                                 daemon=True)
+
+    def start(self):
+        self._decode_thread.start()
+        self._inference_thread.start()
+        self._annotate_thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def running(self):
+        """تا زمانی که مرحله‌ای فعال است یا فریمی برای نمایش مانده"""
+        return self._annotate_thread.is_alive() or len(self.output) > 0
+
+    @property
+    def dropped(self):
+        return self.decoded_frames.dropped + self.detected_frames.dropped + self.output.dropped
+
+    def next_frame(self):
+        """تازه‌ترین فریم آماده نمایش (روی thread رابط گرافیکی صدا زده می‌شود)"""
+        item = self.output.get_latest()
+        if item is not None:
+            self.meters["display"].tick()
+            latency = time.perf_counter() - item.frame.captured_at
+            self.latency = latency if self.meters["display"].count <= 1 else \
+                (1 - EMA_ALPHA) * self.latency + EMA_ALPHA * latency
+        return item
+
+    def stats_text(self):
+        """متن آمار هر مرحله برای کارت Detection Statistics"""
+        fps = " | ".join(f"{name.capitalize()} {meter.fps:.1f}" for name, meter in self.meters.items())
+        return f"FPS: {fps}\nLatency: {self.latency * 1000:.0f} ms | Dropped: {self.dropped}"
+
+    def _decode_loop(self):
+        import cv2
+
+        capture = cv2.VideoCapture(self.source)
+        try:
+            if not capture.isOpened():
+                raise RuntimeError(f"Cannot open video source: {self.source}")
+
+            fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+            index = 0
+            started = time.perf_counter()
+
+            while not self._stop.is_set():
+                ok, pixels = capture.read()
+                if not ok:
+                    if self.loop and isinstance(self.source, str):
+                        capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        index = 0
+                        started = time.perf_counter()
+                        continue
+                    break
+
+                if self.realtime:
+                    # پخش با سرعت واقعی ویدیو: فریم‌ها زودتر از زمان خود تولید نمی‌شوند
+                    delay = started + index / fps - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+
+                self.decoded_frames.put(FrameImage(pixels, index, time.perf_counter()))
+                self.meters["decode"].tick()
+                index += 1
+        except Exception as e:
+            self.error = e
+        finally:
+            capture.release()
+
+    def _inference_loop(self):
+        while not self._stop.is_set():
+            frame = self.decoded_frames.get(timeout=0.1)
+            if frame is None:
+                if not self._decode_thread.is_alive():
+                    break
+                continue
+
+            start_time = time.perf_counter()
+            try:
+                detections = self.engine.detect([frame])[0]
+            except Exception as e:
+                self.error = e
+                self._stop.set()
+                break
+            self.detected_frames.put((frame, detections, time.perf_counter() - start_time))
+            self.meters["inference"].tick()
+
+    def _annotate_loop(self):
+        while not self._stop.is_set():
+            item = self.detected_frames.get(timeout=0.1)
+            if item is None:
+                if not self._inference_thread.is_alive():
+                    break
+                continue
+
+            frame, detections, inference_time = item
+            display_image = self.renderer.render(frame, detections, self.max_size)
+            self.output.put(StreamFrame(frame, detections, display_image, inference_time))
+            self.meters["annotate"].tick()
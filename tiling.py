@@ -0,0 +1,204 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+from detections import Detections
+from profiling import profiler
+
+# اندازه و همپوشانی پیش‌فرض کاشی‌ها
+DEFAULT_TILE_SIZE = 640
+DEFAULT_OVERLAP = 0.2
+DEFAULT_MERGE_IOU = 0.5
+
+# روش‌های ادغام کادرهای کاشی‌های مختلف
+MERGE_NMS = "nms"
+MERGE_WBF = "wbf"
+
+# حداکثر پیکسل تصاویری که حالت کاشی‌بندی با PIL باز می‌کند (حدود 6 گیگابایت RGB پس از decode)؛
+# محدودیت پیش‌فرض PIL (حدود 179 مگاپیکسل) همان تصاویر هوایی بزرگی را رد می‌کند که این حالت برایشان است
+TILED_MAX_IMAGE_PIXELS = 2000 * 1000 * 1000
+
+
+def tile_grid(width, height, tile=DEFAULT_TILE_SIZE, overlap=DEFAULT_OVERLAP):
+    """مختصات (x0, y0, x1, y1) کاشی‌هایی که کل تصویر را با همپوشانی داده‌شده پوشش می‌دهند"""
+    stride = max(int(tile * (1 - overlap)), 1)
+
+    def starts(length):
+        if length <= tile:
+            return [0]
+        positions = list(range(0, length - tile, stride))
+        # آخرین کاشی به لبه تصویر چسبیده است تا بخشی جا نماند
+        positions.append(length - tile)
+        return positions
+
+    return [(x, y, min(x + tile, width), min(y + tile, height))
+            for y in starts(height) for x in starts(width)]
+
+
+class TileSource:
+    """خواندن تنبل کاشی‌ها از فایل بدون نگه داشتن کل تصویر در حافظه (در حد امکان)
+
+    فقط این دو حالت بدون decode کامل تصویر کار می‌کنند:
+    - فایل‌های .npy (آرایه RGB با شکل H×W×3) با np.load(mmap_mode="r") نگاشت می‌شوند.
+    - TIFF فشرده‌نشده در صورت نصب بودن tifffile با memory-map خوانده می‌شود.
+    بقیه فرمت‌ها (JPEG، PNG، WebP، ...) با PIL باز می‌شوند و اولین crop کل تصویر را decode می‌کند.
+    سقف اندازه این تصاویر TILED_MAX_IMAGE_PIXELS است.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._array = None
+        self._image = None
+
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".npy":
+            self._array = np.load(path, mmap_mode="r")
+        elif extension in (".tif", ".tiff"):
+            self._array = self._memmap_tiff(path)
+
+        if self._array is None:
+            self._image = self._open_image(path)
+            if self._image.mode != "RGB":
+                self._image = self._image.convert("RGB")
+
+    @staticmethod
+    def _open_image(path):
+        """باز کردن تصویر با سقف TILED_MAX_IMAGE_PIXELS به جای محدودیت پیش‌فرض PIL"""
+        # بررسی DecompressionBomb فقط هنگام open انجام می‌شود
+        default_limit = Image.MAX_IMAGE_PIXELS
+        Image.MAX_IMAGE_PIXELS = TILED_MAX_IMAGE_PIXELS
+        try:
+            return Image.open(path)
+        finally:
+            Image.MAX_IMAGE_PIXELS = default_limit
+
+    @staticmethod
+    def _memmap_tiff(path):
+        try:
+            import tifffile
+
+            array = tifffile.memmap(path, mode="r")
+        except Exception:
+            return None
+        return array if array.ndim == 3 and array.shape[2] == 3 and array.dtype == np.uint8 else None
+
+    @property
+    def size(self):
+        if self._array is not None:
+            height, width = self._array.shape[:2]
+            return width, height
+        return self._image.size
+
+    def read(self, box):
+        """خواندن یک کاشی به صورت آرایه پیوسته BGR (ورودی مورد انتظار YOLO)"""
+        x0, y0, x1, y1 = box
+        if self._array is not None:
+            return np.ascontiguousarray(self._array[y0:y1, x0:x1, ::-1])
+        region = self._image.crop(box)
+        return np.frombuffer(region.tobytes("raw", "BGR"), dtype=np.uint8).reshape(y1 - y0, x1 - x0, 3)
+
+    def close(self):
+        if self._image is not None:
+            self._image.close()
+        self._array = None
+
+
+class Tile:
+    """یک کاشی با همان رابط DecodedImage (pixels) به همراه جابه‌جایی آن در تصویر اصلی"""
+
+    def __init__(self, pixels, box):
+        self.path = None
+        self.pixels = pixels
+        self.box = box
+
+
+def box_iou(box, boxes):
+    """IoU یک کادر با آرایه‌ای از کادرها (xyxy)"""
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return intersection / np.maximum(area + areas - intersection, 1e-9)
+
+
+def merge_boxes(xyxy, conf, cls, iou=DEFAULT_MERGE_IOU, method=MERGE_NMS):
+    """ادغام کادرهای تکراری کاشی‌های همپوشان با NMS کلاس‌محور یا WBF
+
+    در حالت WBF مختصات کادر نهایی میانگین وزنی (با confidence) کادرهای هم‌گروه است.
+    """
+    if len(conf) == 0:
+        return xyxy, conf, cls
+
+    # جابه‌جایی کادرهای هر کلاس تا کلاس‌های مختلف روی هم اثر نگذارند
+    offsets = cls[:, None].astype(np.float32) * (xyxy.max() + 1)
+    shifted = xyxy + offsets
+
+    order = np.argsort(-conf, kind="stable")
+    keep_boxes, keep_conf, keep_cls = [], [], []
+    while order.size:
+        best = order[0]
+        overlaps = box_iou(shifted[best], shifted[order])
+        group = order[overlaps >= iou]
+
+        if method == MERGE_WBF:
+            weights = conf[group]
+            keep_boxes.append((xyxy[group] * weights[:, None]).sum(axis=0) / weights.sum())
+        else:
+            keep_boxes.append(xyxy[best])
+        keep_conf.append(conf[best])
+        keep_cls.append(cls[best])
+
+        order = order[overlaps < iou]
+
+    return (np.array(keep_boxes, dtype=np.float32), np.array(keep_conf, dtype=np.float32),
+            np.array(keep_cls, dtype=np.int32))
+
+
+def iter_tiles(source, tile=DEFAULT_TILE_SIZE, overlap=DEFAULT_OVERLAP):
+    """تولید تنبل کاشی‌ها؛ هر کاشی فقط هنگام نیاز از فایل خوانده می‌شود"""
+    for box in tile_grid(*source.size, tile=tile, overlap=overlap):
+        yield Tile(source.read(box), box)
+
+
+def detect_tiled(engine, path, tile=DEFAULT_TILE_SIZE, overlap=DEFAULT_OVERLAP, batch_size=8,
+                 iou=DEFAULT_MERGE_IOU, method=MERGE_NMS):
+    """تشخیص روی تصویر بزرگ با تقسیم به کاشی، اجرای دسته‌ای کاشی‌ها و ادغام سراسری کادرها
+
+    خروجی یک Detections در مختصات تصویر اصلی است، مثل engine.detect.
+    """
+    source = TileSource(path)
+    names = engine.names
+    boxes, scores, classes = [], [], []
+
+    try:
+        batch = []
+        tiles = iter_tiles(source, tile=tile, overlap=overlap)
+        while True:
+            item = next(tiles, None)
+            if item is not None:
+                batch.append(item)
+            if batch and (item is None or len(batch) >= batch_size):
+                for tile_item, detections in zip(batch, engine.detect(batch)):
+                    if len(detections):
+                        x0, y0 = tile_item.box[:2]
+                        boxes.append(detections.xyxy + np.array([x0, y0, x0, y0], dtype=np.float32))
+                        scores.append(detections.conf)
+                        classes.append(detections.cls)
+                # آزاد کردن کاشی‌ها قبل از خواندن دسته بعدی
+                batch = []
+            if item is None:
+                break
+    finally:
+        source.close()
+
+    if not boxes:
+        return Detections.empty(names)
+
+    with profiler.stage("merge"):
+        xyxy, conf, cls = merge_boxes(np.concatenate(boxes), np.concatenate(scores), np.concatenate(classes),
+                                      iou=iou, method=method)
+    return Detections(xyxy, conf, cls, names)
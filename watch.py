@@ -0,0 +1,463 @@
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+from batch import make_record, open_writer, add_model_arguments, engine_from_args
+from cache import DetectionCache
+from imaging import DecodedImage, file_signature, is_image_file, PREVIEW_SIZE
+from profiling import profiler
+from store import DetectionStore
+
+# محل پیش‌فرض فهرست فایل‌های پردازش‌شده کنار cache نتایج
+DEFAULT_MANIFEST_PATH = os.path.join(os.path.expanduser("~"), ".cache", "yolo11_app", "watch_manifest.sqlite")
+
+# فایلی که این مدت بدون تغییر اندازه و mtime بماند کامل نوشته‌شده فرض می‌شود (ثانیه)
+DEFAULT_SETTLE_SECONDS = 1.0
+DEFAULT_POLL_INTERVAL = 0.5
+
+# بازبینی کامل پوشه برای تغییرات درجا که mtime پوشه را عوض نمی‌کنند (در حالت polling)
+FULL_RESCAN_INTERVAL = 60.0
+
+# تعداد تلاش برای فایل‌هایی که decode آن‌ها شکست می‌خورد (مثلا هنوز کامل نوشته نشده‌اند)
+MAX_ATTEMPTS = 3
+
+# حالت‌های تشخیص تغییرات
+MODE_WATCHDOG = "watchdog"
+MODE_POLLING = "polling"
+
+
+class Manifest:
+    """فهرست پایدار فایل‌های پردازش‌شده (mtime، اندازه و hash) در SQLite"""
+
+    def __init__(self, path=DEFAULT_MANIFEST_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime_ns INTEGER, "
+                         "size INTEGER, digest TEXT, processed_at REAL)")
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def entries(self, directory):
+        """امضای (mtime، اندازه) فایل‌های پردازش‌شده یک پوشه به صورت dict"""
+        prefix = os.path.join(os.path.abspath(directory), "")
+        with self._lock:
+            rows = self._db.execute("SELECT path, mtime_ns, size FROM files WHERE substr(path, 1, ?) = ?",
+                                    (len(prefix), prefix)).fetchall()
+        return {path: (mtime_ns, size) for path, mtime_ns, size in rows}
+
+    def digest(self, path):
+        with self._lock:
+            row = self._db.execute("SELECT digest FROM files WHERE path = ?", (path,)).fetchone()
+        return row[0] if row else None
+
+    def record(self, path, signature, digest):
+        """ثبت فایل پردازش‌شده؛ با commit() روی دیسک نوشته می‌شود"""
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                             (path, signature[0], signature[1], digest, time.time()))
+
+    def commit(self):
+        with self._lock:
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+
+class FolderWatcher:
+    """پیدا کردن فایل‌های تصویری جدید یا تغییرکرده یک پوشه و صف کردن آن‌ها پس از کامل شدن نوشتن
+
+    در صورت نصب بودن watchdog رویدادهای سیستم فایل استفاده می‌شوند؛ در غیر این صورت فقط
+    پوشه‌هایی که mtime آن‌ها تغییر کرده دوباره خوانده می‌شوند و برای فایل‌های جدید stat گرفته می‌شود.
+    هر فایل تا زمانی که اندازه و mtime آن به مدت settle ثانیه ثابت بماند در انتظار می‌ماند.
+    """
+
+    def __init__(self, directory, processed=None, recursive=False, settle=DEFAULT_SETTLE_SECONDS,
+                 poll_interval=DEFAULT_POLL_INTERVAL, use_watchdog=None):
+        self.directory = os.path.abspath(directory)
+        self.recursive = recursive
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.use_watchdog = use_watchdog
+        self.mode = None
+        self.ready = queue.Queue()
+
+        # امضای فایل‌هایی که پردازش یا صف شده‌اند؛ فقط تغییر امضا باعث صف شدن دوباره می‌شود
+        self._seen = dict(processed or {})
+        self._pending = {}
+        self._directories = {}
+        self._events = queue.Queue()
+        self._observer = None
+        self._last_full_scan = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="folder-watch", daemon=True)
+
+    @property
+    def pending(self):
+        """تعداد فایل‌هایی که هنوز در حال نوشته شدن هستند"""
+        return len(self._pending)
+
+    def start(self):
+        if not os.path.isdir(self.directory):
+            raise FileNotFoundError(f"Not a directory: {self.directory}")
+        if self.use_watchdog is not False and self._start_observer():
+            self.mode = MODE_WATCHDOG
+        else:
+            self.mode = MODE_POLLING
+        self._thread.start()
+
+    def stop(self):
+        """توقف پایش و انتظار برای پایان thread‌های آن"""
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def retry(self, path):
+        """صف کردن دوباره فایلی که decode آن شکست خورد (پس از گذشت دوباره زمان settle)"""
+        self._seen.pop(path, None)
+        self._events.put(path)
+
+    def _start_observer(self):
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return False
+
+        events = self._events
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if not event.is_directory:
+                    events.put(getattr(event, "dest_path", None) or event.src_path)
+
+        self._observer = Observer()
+        self._observer.schedule(Handler(), self.directory, recursive=self.recursive)
+        self._observer.daemon = True
+        self._observer.start()
+        return True
+
+    def _run(self):
+        self._scan_directory(self.directory, full=True)
+        self._last_full_scan = time.monotonic()
+
+        while not self._stop.is_set():
+            # رویدادهای watchdog (یا درخواست‌های retry)
+            try:
+                path = self._events.get(timeout=self.poll_interval)
+                while True:
+                    self._consider(path)
+                    path = self._events.get_nowait()
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            if self.mode == MODE_POLLING:
+                full = now - self._last_full_scan >= FULL_RESCAN_INTERVAL
+                for directory, mtime in list(self._directories.items()):
+                    try:
+                        changed = os.stat(directory).st_mtime_ns != mtime
+                    except OSError:
+                        self._directories.pop(directory, None)
+                        continue
+                    if changed or full:
+                        self._scan_directory(directory, full=full)
+                if full:
+                    self._last_full_scan = now
+
+            self._check_pending(now)
+
+    def _scan_directory(self, directory, full=False):
+        """خواندن یک پوشه؛ فقط برای فایل‌های ناشناخته (یا همه فایل‌ها در بازبینی کامل) stat گرفته می‌شود"""
+        try:
+            self._directories[directory] = os.stat(directory).st_mtime_ns
+            entries = list(os.scandir(directory))
+        except OSError:
+            return
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                # پوشه‌های شناخته‌شده در حلقه اصلی جداگانه بررسی می‌شوند
+                if self.recursive and entry.path not in self._directories:
+                    self._scan_directory(entry.path, full=True)
+            elif is_image_file(entry.name) and (full or entry.path not in self._seen):
+                self._consider(entry.path)
+
+    def _consider(self, path):
+        if not is_image_file(path):
+            return
+        path = os.path.abspath(path)
+        try:
+            signature = file_signature(path)
+        except OSError:
+            # فایل حذف یا جابه‌جا شده است
+            self._pending.pop(path, None)
+            return
+        if self._seen.get(path) == signature:
+            return
+        current = self._pending.get(path)
+        if current is None or current[0] != signature:
+            self._pending[path] = (signature, time.monotonic())
+
+    def _check_pending(self, now):
+        """فایل‌هایی که به مدت settle ثانیه تغییر نکرده‌اند آماده پردازش هستند"""
+        for path, (signature, since) in list(self._pending.items()):
+            try:
+                current = file_signature(path)
+            except OSError:
+                del self._pending[path]
+                continue
+            if current != signature:
+                self._pending[path] = (current, now)
+            elif now - since >= self.settle and current[1] > 0:
+                del self._pending[path]
+                self._seen[path] = current
+                self.ready.put((path, current))
+
+
+class WatchResult:
+    """نتیجه پردازش یک فایل در حالت watch"""
+
+    def __init__(self, path, detections=None, elapsed=0.0, error=None, display_image=None):
+        self.path = path
+        self.detections = detections
+        self.elapsed = elapsed
+        self.error = error
+        self.display_image = display_image
+
+
+class WatchPipeline:
+    """پردازش پیوسته فایل‌های جدید یک پوشه: FolderWatcher → decode → تشخیص دسته‌ای → manifest / store
+
+    فایل‌هایی که قبلا با همان امضا یا همان hash پردازش شده‌اند دوباره به مدل داده نمی‌شوند.
+    اگر renderer داده شود برای آخرین تصویر هر دسته پیش‌نمایش با کادرها ساخته می‌شود.
+    """
+
+    def __init__(self, directory, engine, manifest, store=None, renderer=None, batch_size=8, recursive=False,
+                 settle=DEFAULT_SETTLE_SECONDS, poll_interval=DEFAULT_POLL_INTERVAL, use_watchdog=None,
+                 max_size=PREVIEW_SIZE):
+        self.engine = engine
+        self.manifest = manifest
+        self.store = store
+        self.renderer = renderer
+        self.batch_size = batch_size
+        self.max_size = max_size
+        self.watcher = FolderWatcher(directory, manifest.entries(directory), recursive=recursive, settle=settle,
+                                     poll_interval=poll_interval, use_watchdog=use_watchdog)
+        self.results = queue.Queue()
+
+        self.processed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.busy_time = 0.0
+        self.error = None
+
+        self._attempts = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="watch-detect", daemon=True)
+
+    def start(self):
+        self.watcher.start()
+        self._thread.start()
+
+    def stop(self):
+        """توقف پردازش؛ پس از بازگشت هیچ thread‌ای از engine، manifest یا store استفاده نمی‌کند
+
+        دسته در حال پردازش کامل و در manifest ثبت می‌شود و نتایج آن هنوز با poll() قابل دریافت هستند.
+        """
+        self._stop.set()
+        self.watcher.stop()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    def poll(self):
+        """نتایج آماده (بدون بلاک شدن)؛ روی thread رابط گرافیکی صدا زده می‌شود"""
+        completed = []
+        while True:
+            try:
+                completed.append(self.results.get_nowait())
+            except queue.Empty:
+                return completed
+
+    @property
+    def throughput(self):
+        """تصاویر پردازش‌شده بر ثانیه زمان واقعی صرف‌شده برای دسته‌ها (decode تا ثبت نتایج)"""
+        return self.processed / self.busy_time if self.busy_time > 0 else 0.0
+
+    def stats_text(self):
+        queued = self.watcher.ready.qsize() + self.watcher.pending
+        return (f"Watch ({self.watcher.mode}): {self.processed} processed | {self.skipped} skipped | "
+                f"{self.failed} failed | {queued} queued | {self.throughput:.1f} img/s")
+
+    def _next_batch(self):
+        try:
+            batch = [self.watcher.ready.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.watcher.ready.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _decode(self, path, signature):
+        """decode یک فایل؛ اگر محتوای آن با نسخه پردازش‌شده قبلی یکسان باشد None"""
+        with profiler.stage("decode"):
+            image = DecodedImage.open(path)
+            image.pixels
+        if self.manifest.digest(path) == image.digest:
+            self.manifest.record(path, signature, image.digest)
+            return None
+        return image
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+
+            batch_start = time.perf_counter()
+            images, signatures = [], []
+            for path, signature in batch:
+                try:
+                    image = self._decode(path, signature)
+                except Exception as e:
+                    self._decode_failed(path, e)
+                    continue
+                if image is None:
+                    self.skipped += 1
+                    continue
+                images.append(image)
+                signatures.append(signature)
+
+            if not images:
+                self.manifest.commit()
+                continue
+
+            start_time = time.perf_counter()
+            try:
+                detections = self.engine.detect(images)
+            except Exception as e:
+                self.error = e
+                for image in images:
+                    self.failed += 1
+                    self.results.put(WatchResult(image.path, error=e))
+                continue
+            elapsed = (time.perf_counter() - start_time) / len(images)
+
+            for i, (image, signature, items) in enumerate(zip(images, signatures, detections)):
+                self.manifest.record(image.path, signature, image.digest)
+                if self.store is not None:
+                    self.store.add(image.path, items)
+                self._attempts.pop(image.path, None)
+
+                display_image = None
+                if self.renderer is not None and i == len(images) - 1:
+                    display_image = self.renderer.render(image, items, self.max_size)
+                self.results.put(WatchResult(image.path, items, elapsed, display_image=display_image))
+                self.processed += 1
+            # یک commit برای هر دسته به جای هر فایل
+            self.manifest.commit()
+            self.busy_time += time.perf_counter() - batch_start
+            if self.store is not None:
+                self.store.maybe_save()
+
+    def _decode_failed(self, path, error):
+        """فایل ناقص یا خراب: تا MAX_ATTEMPTS بار دوباره منتظر کامل شدن آن می‌مانیم"""
+        attempts = self._attempts.get(path, 0) + 1
+        self._attempts[path] = attempts
+        if attempts < MAX_ATTEMPTS:
+            self.watcher.retry(path)
+            return
+        self._attempts.pop(path, None)
+        self.failed += 1
+        self.results.put(WatchResult(path, error=error))
+
+
+def format_log_line(result):
+    """یک خط گزارش برای هر فایل: زمان، نام فایل و تعداد هر کلاس"""
+    stamp = time.strftime("%H:%M:%S")
+    name = os.path.basename(result.path)
+    if result.error is not None:
+        return f"{stamp}  {name}  ❌ {result.error}"
+    counts = ", ".join(f"{count} {label}" for label, _, count in result.detections.ranking()) or "no objects"
+    return f"{stamp}  {name}  {counts}  ({result.elapsed * 1000:.0f} ms)"
+
+
+def add_arguments(parser):
+    """آرگومان‌های خط فرمان حالت watch"""
+    parser.add_argument("directory", help="folder to watch for new images")
+    parser.add_argument("-o", "--output", help="append records to this file (.jsonl or .csv); stdout if omitted")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="output format (default: from extension)")
+    parser.add_argument("--recursive", action="store_true", help="also watch sub-folders")
+    parser.add_argument("--batch-size", type=int, default=8, help="max images per predict call")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE_SECONDS,
+                        help="seconds a file must stay unchanged before it is processed")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL)
+    parser.add_argument("--polling", action="store_true", help="do not use watchdog even if installed")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_PATH, help="processed-files manifest (SQLite)")
+    parser.add_argument("--store", metavar="PATH", help="append detections to this columnar store (.npz)")
+    parser.add_argument("--cache", metavar="PATH", help="SQLite detection cache")
+    add_model_arguments(parser)
+
+
+def run(args):
+    """پردازش پیوسته پوشه تا زمان Ctrl+C"""
+    cache = DetectionCache(path=args.cache) if args.cache else None
+    store = DetectionStore.open(args.store) if args.store else None
+    manifest = Manifest(args.manifest)
+    engine = engine_from_args(args, cache=cache)
+    engine.load()
+
+    output_format = args.format or ("csv" if args.output and args.output.lower().endswith(".csv") else "jsonl")
+    # فایل خروجی در حالت append باز می‌شود؛ سطر عنوان CSV فقط برای فایل جدید یا خالی نوشته می‌شود
+    header = not args.output or not os.path.exists(args.output) or os.path.getsize(args.output) == 0
+    file = open(args.output, "a", encoding="utf-8", newline="") if args.output else sys.stdout
+    writer = open_writer(file, output_format, header=header)
+
+    def write_results():
+        for result in pipeline.poll():
+            if result.error is not None:
+                writer.write({"image": result.path, "error": str(result.error)})
+            else:
+                writer.write(make_record(result.path, result.detections, result.elapsed))
+
+    pipeline = WatchPipeline(args.directory, engine, manifest, store=store, batch_size=args.batch_size,
+                             recursive=args.recursive, settle=args.settle, poll_interval=args.poll_interval,
+                             use_watchdog=False if args.polling else None)
+    pipeline.start()
+    print(f"Watching {pipeline.watcher.directory} ({pipeline.watcher.mode}), Ctrl+C to stop", file=sys.stderr)
+    try:
+        while pipeline.running:
+            write_results()
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # ابتدا دسته در حال پردازش کامل می‌شود، سپس engine، manifest و store بسته می‌شوند
+        pipeline.stop()
+        write_results()
+        print(pipeline.stats_text(), file=sys.stderr)
+        engine.close()
+        manifest.close()
+        if store is not None:
+            store.save()
+        if cache is not None:
+            cache.close()
+        if file is not sys.stdout:
+            file.close()
+    return 0